@@ -3,14 +3,21 @@
 考勤统计表生成工具 - exe打包脚本
 
 这个脚本用于将Python程序打包成Windows可执行文件。
+
+用法：
+    python build_exe.py            # 单文件版（onefile）
+    python build_exe.py --onedir   # 目录版（onedir），启动时无需解压，冷启动更快
 """
 
+import argparse
 import subprocess
 import sys
 import os
 import shutil
 
-def run_command(cmd, description):
+SPEC_FILE = "考勤统计表生成工具.spec"
+
+def run_command(cmd, description, env=None):
     """运行命令并显示结果"""
     print(f"\n{'='*50}")
     print(f"Executing: {description}")
@@ -18,7 +25,7 @@ def run_command(cmd, description):
     print('='*50)
     
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, env=env)
         print("Output:")
         print(result.stdout)
         if result.stderr:
@@ -50,9 +57,23 @@ def check_dependencies():
         return False
     
     print("OK Main program file exists")
+    
+    # 检查打包配置文件
+    if not os.path.exists(SPEC_FILE):
+        print("FAIL Spec file not found")
+        return False
+    
+    print("OK Spec file exists")
     return True
 
-def build_exe():
+def get_exe_path(exe_name, onedir=False):
+    """onefile 版位于 dist/ 下，onedir 版位于 dist/<名称>/ 目录中"""
+    base_name = os.path.splitext(exe_name)[0]
+    if onedir:
+        return f"dist/{base_name}/{exe_name}"
+    return f"dist/{exe_name}"
+
+def build_exe(onedir=False):
     """构建可执行文件"""
     print("\nStarting executable build...")
     
@@ -63,17 +84,16 @@ def build_exe():
     
     if system == "Windows":
         exe_name = "AttendanceSheetTool.exe"
-        exe_path = f"dist/{exe_name}"
     elif system == "Darwin":  # macOS
         exe_name = "AttendanceSheetTool"
-        exe_path = f"dist/{exe_name}"
         print("Note: Building on macOS, generating macOS executable")
         print("To run on Windows, rebuild on Windows system")
     else:  # Linux
         exe_name = "AttendanceSheetTool"
-        exe_path = f"dist/{exe_name}"
         print("Note: Building on Linux, generating Linux executable")
         print("To run on Windows, rebuild on Windows system")
+    exe_path = get_exe_path(exe_name, onedir)
+    print(f"Build mode: {'onedir' if onedir else 'onefile'}")
     
     # 清理之前的构建文件
     if os.path.exists("dist"):
@@ -83,9 +103,12 @@ def build_exe():
     if os.path.exists(f"{exe_name}.spec"):
         os.remove(f"{exe_name}.spec")
     
-    # 构建可执行文件
-    cmd = f'pyinstaller --onefile --name "{exe_name}" --clean create_new_attendance_sheet.py'
-    if not run_command(cmd, "Build executable"):
+    # 构建可执行文件：使用 spec 文件，其中排除了程序用不到的模块
+    env = dict(os.environ)
+    env["ATTENDANCE_EXE_NAME"] = "AttendanceSheetTool"
+    env["ATTENDANCE_ONEDIR"] = "1" if onedir else "0"
+    cmd = f'pyinstaller --clean --noconfirm "{SPEC_FILE}"'
+    if not run_command(cmd, "Build executable", env=env):
         print("Build failed!")
         return False
     
@@ -103,7 +126,7 @@ def build_exe():
         print(f"FAIL Build failed, executable not found: {exe_path}")
         return False
 
-def create_release_package():
+def create_release_package(onedir=False):
     """创建发布包"""
     print("\nCreating release package...")
     
@@ -124,11 +147,16 @@ def create_release_package():
         shutil.rmtree(release_dir)
     os.makedirs(release_dir)
     
-    # 复制可执行文件
-    exe_source = f"dist/{exe_name}"
-    exe_dest = f"{release_dir}/{exe_name}"
+    # 复制可执行文件（onedir 版复制整个目录）
+    exe_source = get_exe_path(exe_name, onedir)
     
-    if os.path.exists(exe_source):
+    if os.path.exists(exe_source) and onedir:
+        dir_source = os.path.dirname(exe_source)
+        dir_dest = f"{release_dir}/{os.path.basename(dir_source)}"
+        shutil.copytree(dir_source, dir_dest)
+        print(f"OK Copied executable directory to: {dir_dest}")
+    elif os.path.exists(exe_source):
+        exe_dest = f"{release_dir}/{exe_name}"
         shutil.copy2(exe_source, exe_dest)
         print(f"OK Copied executable to: {exe_dest}")
     else:
@@ -154,6 +182,11 @@ def create_release_package():
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='考勤统计表生成工具 - exe打包脚本')
+    parser.add_argument('--onedir', action='store_true',
+                        help='生成目录版（启动时无需解压，冷启动更快）')
+    args = parser.parse_args()
+    
     print("Attendance Sheet Tool - exe build script")
     print("="*50)
     
@@ -163,12 +196,12 @@ def main():
         return
     
     # 构建exe文件
-    if not build_exe():
+    if not build_exe(args.onedir):
         print("\nERROR Build failed")
         return
     
     # 创建发布包
-    if not create_release_package():
+    if not create_release_package(args.onedir):
         print("\nERROR Failed to create release package")
         return
     
@@ -1,69 +1,135 @@
-import pandas as pd
+# pandas、numpy、openpyxl 导入较慢，只在用到的函数内部导入，
+# 使 --help 等不处理数据的命令能快速启动
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-import numpy as np
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from copy import copy
+import functools
 import glob
+import hashlib
+import io
+import itertools
+import json
+import logging
+import multiprocessing
 import re
 import sys
 import os
+import time
+
+logger = logging.getLogger('attendance')
+# 每个员工每天的打卡明细，只有 --verbose 或 --log-json 时才会生成
+day_logger = logging.getLogger('attendance.days')
+
+class JsonLinesFormatter(logging.Formatter):
+    """把每天的打卡明细记录格式化为一行 JSON"""
+    
+    def format(self, record):
+        return json.dumps(record.day_record, ensure_ascii=False)
+
+def configure_logging(level=logging.INFO, json_file=None, stream=None):
+    """配置日志输出：控制台只输出 level 及以上的信息，json_file 记录每天的打卡明细"""
+    logger.handlers.clear()
+    day_logger.handlers.clear()
+    logger.setLevel(level)
+    logger.propagate = False
+    
+    console = logging.StreamHandler(stream or sys.stdout)
+    console.setLevel(level)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console)
+    
+    if json_file:
+        json_handler = logging.FileHandler(json_file, mode='w', encoding='utf-8')
+        json_handler.setFormatter(JsonLinesFormatter())
+        json_handler.addFilter(lambda record: hasattr(record, 'day_record'))
+        day_logger.addHandler(json_handler)
+        day_logger.setLevel(logging.DEBUG)
+    else:
+        day_logger.setLevel(logging.NOTSET)
 
 def get_weekday_name(date):
     """获取星期名称"""
     weekdays = ['星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日']
     return weekdays[date.weekday()]
 
-def parse_punch_times(time_str):
-    """解析打卡时间字符串，返回签到和签退时间"""
-    if pd.isna(time_str) or time_str == '':
-        return None, None
-    times = [t.strip() for t in str(time_str).split('\n') if t.strip()]
-    if len(times) == 0:
-        return None, None
-    elif len(times) == 1:
-        return times[0], None
-    else:
-        return times[0], times[-1]
+# 一段打卡记录：从第一个非空白字符开始，到同一行最后一个非空白字符结束
+_PUNCH_TOKEN_PATTERN = r'(\S(?:[^\n]*\S)?)'
+# HH:MM 格式的打卡时间
+_HH_MM_PATTERN = r'^\s*([+-]?\d+)\s*:\s*([+-]?\d+)\s*$'
 
-def calculate_work_hours(check_in_time, check_out_time):
-    """计算工作时长（小时）"""
-    if not check_in_time or not check_out_time:
-        return 0.0
+def _is_present(values):
+    """判断对象数组中的每个元素是否为非空的打卡时间"""
+    import pandas as pd
+    return pd.notna(values) & (values != '')
+
+def parse_punch_block(values):
+    """批量解析打卡时间（员工 × 天），返回签到、签退两个对象数组，缺失处为 None
     
-    def parse_time(time_str):
-        """解析时间字符串为小时数"""
-        try:
-            # 处理 HH:MM 格式
-            if ':' in time_str:
-                hours, minutes = map(int, time_str.split(':'))
-                return hours + minutes / 60.0
-            # 处理 HH.MM 格式
-            elif '.' in time_str:
-                return float(time_str)
-            else:
-                return float(time_str)
-        except:
-            return 0.0
+    每个单元格按换行拆分，取第一条作为签到、最后一条作为签退，
+    只有一条记录时签退为 None。
+    """
+    import pandas as pd
+    import numpy as np
+    values = np.asarray(values, dtype=object)
+    series = pd.Series(values.ravel(), dtype=object)
+    text = series.where(_is_present(series), '').astype(str)
     
-    check_in_hours = parse_time(check_in_time)
-    check_out_hours = parse_time(check_out_time)
+    first = text.str.extract(_PUNCH_TOKEN_PATTERN, expand=False)
+    # 字符串反转后取第一条，即为原字符串中的最后一条
+    last = text.str[::-1].str.extract(_PUNCH_TOKEN_PATTERN, expand=False).str[::-1]
+    token_count = text.str.count(r'\S[^\n]*').to_numpy()
     
-    if check_in_hours == 0 or check_out_hours == 0:
-        return 0.0
+    check_in = np.where(token_count >= 1, first.to_numpy(dtype=object, na_value=None), None)
+    check_out = np.where(token_count >= 2, last.to_numpy(dtype=object, na_value=None), None)
+    return check_in.reshape(values.shape), check_out.reshape(values.shape)
+
+def _punch_hours(values):
+    """批量把打卡时间文字转换为小时数，无法解析的按 0 处理"""
+    import pandas as pd
+    import numpy as np
+    text = pd.Series(values.ravel(), dtype=object).where(_is_present(values.ravel()), '').astype(str)
     
-    # 判断是否跨天
-    if check_in_hours > check_out_hours:
-        # 跨天情况：签到时间 > 签退时间
-        # 计算公式：(24:00 - 签到时间) + 签退时间
-        work_hours = (24.0 - check_in_hours) + check_out_hours
-    else:
-        # 同一天情况：签到时间 < 签退时间
-        # 计算公式：签退时间 - 签到时间
-        work_hours = check_out_hours - check_in_hours
+    # 处理 HH:MM 格式
+    hh_mm = text.str.extract(_HH_MM_PATTERN)
+    colon_hours = pd.to_numeric(hh_mm[0], errors='coerce') + pd.to_numeric(hh_mm[1], errors='coerce') / 60.0
+    # 处理 HH.MM 及纯数字格式
+    plain_hours = pd.to_numeric(text, errors='coerce')
     
-    return max(0.0, work_hours)
+    has_colon = text.str.contains(':', regex=False).to_numpy(dtype=bool)
+    hours = np.where(has_colon, colon_hours.to_numpy(dtype=float), plain_hours.to_numpy(dtype=float))
+    return np.nan_to_num(hours, nan=0.0).reshape(values.shape)
+
+def calculate_work_hours_batch(check_in, check_out):
+    """批量计算工作时长（小时），签到或签退缺失的位置为 0"""
+    import numpy as np
+    check_in = np.asarray(check_in, dtype=object)
+    check_out = np.asarray(check_out, dtype=object)
+    
+    check_in_hours = _punch_hours(check_in)
+    check_out_hours = _punch_hours(check_out)
+    
+    valid = (_is_present(check_in) & _is_present(check_out)
+             & (check_in_hours != 0) & (check_out_hours != 0))
+    
+    # 跨天情况：签到时间 > 签退时间，计算公式：(24:00 - 签到时间) + 签退时间
+    # 同一天情况：签到时间 <= 签退时间，计算公式：签退时间 - 签到时间
+    work_hours = np.where(check_in_hours > check_out_hours,
+                          (24.0 - check_in_hours) + check_out_hours,
+                          check_out_hours - check_in_hours)
+    
+    return np.where(valid & (work_hours > 0), work_hours, 0.0)
+
+def parse_punch_times(time_str):
+    """解析打卡时间字符串，返回签到和签退时间"""
+    check_in, check_out = parse_punch_block([[time_str]])
+    return check_in[0, 0], check_out[0, 0]
+
+def calculate_work_hours(check_in_time, check_out_time):
+    """计算工作时长（小时）"""
+    return float(calculate_work_hours_batch([check_in_time], [check_out_time])[0])
 
 def test_time_calculation():
     """测试时间计算逻辑"""
@@ -110,6 +176,16 @@ def find_source_file(pattern=None):
     
     return None
 
+def find_source_files(pattern=None):
+    """查找所有符合格式的数据源文件，按年月排序"""
+    source_files = glob.glob(pattern or '考勤表-上下班工时统计表*.xlsx')
+    dated_files = []
+    for file in source_files:
+        year, month = parse_date_from_filename(os.path.basename(file))
+        if year and month:
+            dated_files.append((year, month, file))
+    return [file for _, _, file in sorted(dated_files)]
+
 def parse_date_from_filename(filename):
     """从文件名解析年月信息"""
     pattern = r'考勤表-上下班工时统计表(\d{4})年(\d{1,2})月.*\.xlsx'
@@ -133,282 +209,2231 @@ def get_days_in_month(year, month):
     else:
         return 31  # 大月31天
 
-def create_new_attendance_sheet(source_file=None, output_file=None, year=None, month=None):
-    """创建新的考勤统计表"""
-    print("正在创建新的考勤统计表...")
+def _is_missing(value):
+    """判断单元格是否为空：None、空字符串或 NaN"""
+    return value is None or value == '' or (isinstance(value, float) and value != value)
+
+def _normalize_position(position):
+    """统一岗位取值，缺失时视为空字符串"""
+    if _is_missing(position):
+        return ''
+    return str(position).strip()
+
+# 每条记录固定保存 1-31 日的打卡时间
+MAX_DAYS = 31
+
+class PunchRecord:
+    """打卡时间表中的一行：姓名、考勤组和 1-31 日的原始打卡时间
     
-    # 查找数据源文件
-    if not source_file:
-        source_file = find_source_file()
+    punches[day - 1] 为当天的打卡单元格，表头中找不到该日期时为 None。
+    """
+    __slots__ = ('name', 'group', 'punches')
     
-    if not source_file:
-        print("错误：未找到数据源文件！")
-        print("请确保当前目录下有符合格式的文件：考勤表-上下班工时统计表YYYY年M月.xlsx")
-        return None
+    def __init__(self, name, group, punches):
+        self.name = name
+        self.group = group
+        self.punches = punches
+
+# 打卡矩阵中表示“没有这条打卡记录”的分钟数（int16 最小值）
+MISSING_MINUTES = -32768
+# 写入表格的时间值和工时保留的小数位数：读回时仍精确到分钟，数字较短，压缩后文件更小
+EXCEL_DECIMALS = 10
+# 标准的 HH:MM 打卡时间，可以由分钟数原样还原
+_CANONICAL_PUNCH_PATTERN = r'\d{2}:[0-5]\d'
+
+@functools.lru_cache(maxsize=None)
+def _minute_labels():
+    """分钟数 -> 'HH:MM' 文字的查找表，覆盖 00:00 到 99:59"""
+    import numpy as np
+    return np.array([f'{hour:02d}:{minute:02d}' for hour in range(100) for minute in range(60)], dtype=object)
+
+@functools.lru_cache(maxsize=None)
+def _minute_values():
+    """分钟数 -> Excel 时间值（一天的比例）的查找表，覆盖 00:00 到 99:59"""
+    import numpy as np
+    return np.array([round(minutes / (24 * 60), EXCEL_DECIMALS) for minutes in range(100 * 60)], dtype=object)
+
+def punch_minutes(values):
+    """批量把打卡时间文字转换为距 0 点的分钟数（int16），缺失处为 MISSING_MINUTES
     
-    print(f"找到数据源文件：{source_file}")
+    无法解析的时间按 0 处理，与 calculate_work_hours 一致；小数小时按整分钟取整。
+    """
+    import numpy as np
+    values = np.asarray(values, dtype=object)
+    minutes = np.clip(np.rint(_punch_hours(values) * 60), MISSING_MINUTES + 1, 32767).astype(np.int16)
+    return np.where(_is_present(values), minutes, np.int16(MISSING_MINUTES))
+
+class PunchMatrix:
+    """打卡矩阵：签到、签退为 (员工, 天) 的 int16 分钟数，缺失处为 MISSING_MINUTES
     
-    # 解析年月信息
-    if not year or not month:
-        parsed_year, parsed_month = parse_date_from_filename(source_file)
-        if not parsed_year or not parsed_month:
-            print("错误：无法从文件名解析年月信息！")
-            return None
-        year, month = parsed_year, parsed_month
+    names / groups 为每行的姓名和考勤组；texts 保存不能由分钟数原样还原的打卡文字
+    （如 '9:05'、'8.5'），键为 (行, 天下标, 0 签到 / 1 签退)，通常为空。
+    """
+    __slots__ = ('names', 'groups', 'check_in', 'check_out', 'texts')
     
-    print(f"解析得到：{year}年{month}月")
+    def __init__(self, names, groups, check_in, check_out, texts=None):
+        self.names = names
+        self.groups = groups
+        self.check_in = check_in
+        self.check_out = check_out
+        self.texts = texts or {}
     
-    # 读取原始数据获取员工信息
-    try:
-        df_original = pd.read_excel(source_file, sheet_name='月度汇总', header=[5, 6])
-        df_punch = pd.read_excel(source_file, sheet_name='打卡时间', header=[2, 3])
-    except Exception as e:
-        print(f"错误：读取Excel文件失败 - {e}")
-        return None
+    def __len__(self):
+        return len(self.names)
     
-    # 获取员工列表
-    employees = df_original.iloc[:, 0].dropna().tolist()
-    positions = df_original.iloc[:, 1].dropna().tolist()
+    @classmethod
+    def from_records(cls, punch_records, days=None):
+        """把打卡记录解析为打卡矩阵，每个单元格只解析一次
+        
+        days 为要解析的日期列表（默认 1-31 日），矩阵的列与 days 一一对应。
+        """
+        import pandas as pd
+        import numpy as np
+        days = days or range(1, MAX_DAYS + 1)
+        block = np.full((len(punch_records), len(days)), None, dtype=object)
+        for row, record in enumerate(punch_records):
+            block[row] = [record.punches[day - 1] for day in days]
+        check_in_text, check_out_text = parse_punch_block(block)
+        check_in = punch_minutes(check_in_text)
+        check_out = punch_minutes(check_out_text)
+        
+        texts = {}
+        for kind, (text, minutes) in enumerate(((check_in_text, check_in), (check_out_text, check_out))):
+            canonical = pd.Series(text.ravel(), dtype=object).str.fullmatch(_CANONICAL_PUNCH_PATTERN)
+            canonical = canonical.to_numpy(dtype=bool, na_value=False).reshape(text.shape)
+            for row, day in zip(*np.nonzero((minutes != MISSING_MINUTES) & ~canonical)):
+                texts[(int(row), int(day), kind)] = text[row, day]
+        
+        names = [record.name for record in punch_records]
+        groups = [record.group for record in punch_records]
+        return cls(names, groups, check_in, check_out, texts)
     
-    print(f"找到 {len(employees)} 个员工: {employees}")
-    print(f"岗位信息: {positions}")
+    def take(self, rows, days=None):
+        """取出指定行（及前 days 天），返回新的打卡矩阵"""
+        import numpy as np
+        rows = np.asarray(rows, dtype=np.intp)
+        days = self.check_in.shape[1] if days is None else days
+        new_rows = {}
+        for i, row in enumerate(rows.tolist()):
+            new_rows.setdefault(row, []).append(i)
+        texts = {
+            (i, day, kind): text
+            for (row, day, kind), text in self.texts.items() if day < days
+            for i in new_rows.get(row, ())
+        }
+        return PunchMatrix([self.names[row] for row in rows], [self.groups[row] for row in rows],
+                           self.check_in[rows, :days], self.check_out[rows, :days], texts)
     
-    # 计算指定年月的天数
-    days_in_month = get_days_in_month(year, month)
-    print(f"{year}年{month}月共有{days_in_month}天")
+    def _punch_labels(self, kind, table):
+        import numpy as np
+        minutes = self.check_in if kind == 0 else self.check_out
+        labels = np.full(minutes.shape, None, dtype=object)
+        canonical = (minutes >= 0) & (minutes < len(table))
+        labels[canonical] = table[minutes[canonical]]
+        for (row, day, text_kind), text in self.texts.items():
+            if text_kind == kind:
+                labels[row, day] = text
+        return labels
     
-    # 创建工作簿
-    wb = Workbook()
-    ws = wb.active
+    def punch_texts(self, kind):
+        """还原签到（kind=0）或签退（kind=1）的打卡文字，返回对象数组，缺失处为 None"""
+        return self._punch_labels(kind, _minute_labels())
     
-    # 设置样式
-    header_font = Font(name='微软雅黑', size=12, bold=True)
-    date_font = Font(name='微软雅黑', size=10)
-    cell_font = Font(name='微软雅黑', size=9)
+    def punch_values(self, kind):
+        """签到（kind=0）或签退（kind=1）写入表格的值：Excel 时间值，缺失处为 None
+        
+        不能由分钟数原样还原的打卡文字（如 '8.5'）仍按原文字写入。
+        """
+        return self._punch_labels(kind, _minute_values())
+    
+    def present(self):
+        """有打卡记录（至少有签到）的位置"""
+        return self.check_in != MISSING_MINUTES
     
-    header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    date_fill = PatternFill(start_color="E6E6E6", end_color="E6E6E6", fill_type="solid")
+    def worked(self):
+        """签到、签退都有记录的位置，即计入工作天数的日期"""
+        return (self.check_in != MISSING_MINUTES) & (self.check_out != MISSING_MINUTES)
     
+    def work_minutes(self):
+        """每天的工作时长（分钟，int16）
+        
+        签到或签退缺失、或任一为 0 点（含无法解析）时为 0；签到晚于签退按跨天计算。
+        """
+        import numpy as np
+        check_in = self.check_in.astype(np.int32)
+        check_out = self.check_out.astype(np.int32)
+        valid = self.worked() & (check_in != 0) & (check_out != 0)
+        minutes = np.where(check_in > check_out, 24 * 60 - check_in + check_out, check_out - check_in)
+        return np.where(valid & (minutes > 0), minutes, 0).astype(np.int16)
+    
+    def work_hours(self):
+        """每天的工作时长（小时），计算规则见 work_minutes"""
+        return self.work_minutes() / 60.0
+
+def build_punch_index(punch_matrix):
+    """建立打卡时间表的行号索引
+    
+    返回 (按姓名+岗位索引, 按姓名索引) 两个字典，值为行号列表，
+    同名员工按在打卡表中出现的顺序保存，便于按序号确定性地匹配。
+    """
+    by_name_position = {}
+    by_name = {}
+    for row_pos, (name, group) in enumerate(zip(punch_matrix.names, punch_matrix.groups)):
+        if _is_missing(name):
+            continue
+        by_name_position.setdefault((name, _normalize_position(group)), []).append(row_pos)
+        by_name.setdefault(name, []).append(row_pos)
+    return by_name_position, by_name
+
+def lookup_punch_row(punch_index, employee_key, claimed=()):
+    """根据员工键 (姓名, 岗位, 序号) 查找打卡表行号，找不到时返回 None
+    
+    姓名+岗位匹配不到时退回到仅按姓名匹配，取第一个不在 claimed（已分配给其他员工的行号）中的行。
+    """
+    by_name_position, by_name = punch_index
+    employee, position, occurrence = employee_key
+    rows = by_name_position.get((employee, position))
+    if rows is not None:
+        return rows[occurrence] if occurrence < len(rows) else None
+    # 两张表岗位不一致时退回到仅按姓名匹配
+    return next((row for row in by_name.get(employee, []) if row not in claimed), None)
+
+def build_roster(employees, positions, punch_matrix):
+    """按月度汇总的顺序匹配每个员工的打卡记录
+    
+    返回 (roster, 打卡行号列表)：roster 为 [(员工键, 岗位, 是否有打卡记录)]，
+    员工键为 (姓名, 岗位, 序号)，同名同岗位员工用序号区分；
+    打卡行号列表为有打卡记录的员工在 punch_matrix 中的行号，顺序与 roster 一致。
+    """
+    # 预先建立打卡表索引，避免每个员工都扫描整张表
+    punch_index = build_punch_index(punch_matrix)
+    employee_keys = []
+    occurrences = {}
+    for employee, position in zip(employees, positions):
+        position_key = _normalize_position(position)
+        occurrence = occurrences.get((employee, position_key), 0)
+        occurrences[(employee, position_key)] = occurrence + 1
+        employee_keys.append((employee, position_key, occurrence))
+    
+    # 先匹配姓名+岗位一致的员工，再为岗位不一致的员工按姓名分配剩下的行，同一行不会分给两个同名员工
+    punch_rows = [None] * len(employee_keys)
+    claimed = set()
+    for exact in (True, False):
+        for i, employee_key in enumerate(employee_keys):
+            if (employee_key[:2] in punch_index[0]) == exact:
+                punch_rows[i] = lookup_punch_row(punch_index, employee_key, claimed)
+                if punch_rows[i] is not None:
+                    claimed.add(punch_rows[i])
+    
+    roster = [(employee_key, position, punch_row is not None)
+              for employee_key, position, punch_row in zip(employee_keys, positions, punch_rows)]
+    punch_positions = [punch_row for punch_row in punch_rows if punch_row is not None]
+    return roster, punch_positions
+
+def build_sheet_styles():
+    """创建考勤表使用的命名样式，键为样式简称，值为 NamedStyle"""
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+    cell_font = Font(name='微软雅黑', size=9)
     border = Border(
         left=Side(style='thin'),
         right=Side(style='thin'),
         top=Side(style='thin'),
         bottom=Side(style='thin')
     )
-    
     center_alignment = Alignment(horizontal='center', vertical='center')
     
-    # 创建表头
-    print("正在创建表头...")
+    return {
+        'title': NamedStyle(name='考勤表标题', font=Font(name='微软雅黑', size=16, bold=True),
+                            alignment=center_alignment),
+        'company': NamedStyle(name='考勤表公司', font=cell_font, alignment=Alignment(horizontal='left')),
+        'info': NamedStyle(name='考勤表时间', font=cell_font),
+        'header': NamedStyle(name='考勤表表头', font=Font(name='微软雅黑', size=12, bold=True),
+                             fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"),
+                             border=border, alignment=center_alignment),
+        'cell': NamedStyle(name='考勤表单元格', font=cell_font, border=border, alignment=center_alignment),
+        'punch': NamedStyle(name='考勤表打卡时间', font=cell_font, border=border, alignment=center_alignment,
+                            number_format='hh:mm'),
+        'hours': NamedStyle(name='考勤表工时', font=cell_font, border=border, alignment=center_alignment,
+                            number_format='0.00'),
+        'rate': NamedStyle(name='考勤表比例', font=cell_font, border=border, alignment=center_alignment,
+                           number_format='0.0%'),
+    }
+
+def get_column_width(col):
+    """返回列宽：前三列12，工作时长列8，签到签退列10"""
+    if col <= 3:
+        return 12
+    elif col % 2 == 0:  # 工作时长列
+        return 8
+    else:  # 签到签退列
+        return 10
+
+def get_employee_row_styles(days_in_month):
+    """员工数据行每列的样式简称：签到签退列使用时间格式，工作时长和累计时长列使用工时格式"""
+    row_styles = ['cell'] * (days_in_month * 2 + 6)
+    for day in range(days_in_month):
+        row_styles[3 + day * 2] = 'punch'
+        row_styles[4 + day * 2] = 'hours'
+    row_styles[3 + days_in_month * 2] = 'hours'  # 累计时长列
+    return row_styles
+
+# 签退行的行默认样式：纵向合并区域下半部分的单元格不写出，边框、字体由它提供
+MERGED_ROW_STYLE = 'cell'
+
+# 数据缺失的签到签退单元格留空，由一条条件格式规则标记为浅红色底纹
+MISSING_FILL_COLOR = 'FFC7CE'
+
+def build_missing_sqref(first_rows, first_col, last_col):
+    """把需要标记数据缺失的员工（签到、签退两行）合并为连续的行区间，返回条件格式的 sqref"""
+    from openpyxl.utils import get_column_letter
+    blocks = []
+    for row in first_rows:
+        if blocks and blocks[-1][1] + 1 == row:
+            blocks[-1][1] = row + 1
+        else:
+            blocks.append([row, row + 1])
+    first, last = get_column_letter(first_col), get_column_letter(last_col)
+    return ' '.join(f'{first}{start}:{last}{end}' for start, end in blocks)
+
+def add_missing_format(ws, sqref):
+    """添加数据缺失的条件格式：区域内空白的签到签退单元格（偶数列）显示浅红色底纹，工作时长列不标记"""
+    from openpyxl.formatting.rule import FormulaRule
+    from openpyxl.styles import PatternFill
+    top_left = sqref.split(':', 1)[0]
+    fill = PatternFill(start_color=MISSING_FILL_COLOR, end_color=MISSING_FILL_COLOR, fill_type='solid')
+    ws.conditional_formatting.add(sqref, FormulaRule(
+        formula=[f'AND(MOD(COLUMN({top_left}),2)=0,ISBLANK({top_left}))'], fill=fill))
+
+def register_merged_ranges(ws, ranges):
+    """一次性把合并区域注册到工作表
     
-    # 第1行：标题
-    ws.merge_cells('A1:Z1')
-    ws['A1'] = '考勤表-上下班工时统计表'
-    ws['A1'].font = Font(name='微软雅黑', size=16, bold=True)
-    ws['A1'].alignment = center_alignment
+    MultiCellRange.add 每次都会与已有区域逐一比较，合并区域多时是平方复杂度；
+    这里的区域由表格布局保证互不重叠，直接整体重建即可。
+    使用普通的 CellRange 而不是 MergedCellRange：后者创建时会逐个改写边框样式，合并区域多时是最慢的一步，
+    而写出的单元格、样式和合并区域完全相同。
+    直接替换 ws.merged_cells 依赖 openpyxl 的内部实现，已验证的版本范围见 requirements.txt。
+    """
+    from openpyxl.worksheet.cell_range import MultiCellRange
+    ws.merged_cells = MultiCellRange(list(ws.merged_cells.ranges) + list(ranges))
+
+class _BaseSheetWriter(ABC):
+    """两种写入模式共用的逻辑：命名样式注册、多工作表切换和合并区域登记
     
-    # 第2行：公司信息
-    ws.merge_cells('A2:Z2')
-    ws['A2'] = '公司名称：武汉福福数通网络科技有限公司'
-    ws['A2'].font = cell_font
-    ws['A2'].alignment = Alignment(horizontal='left')
+    子类实现 _create_sheet 和 append；基类本身不能实例化。
+    """
     
-    # 第3行：空行
-    ws['A3'] = ''
+    def __init__(self, wb, styles, last_col):
+        self.wb = wb
+        self.last_col = last_col
+        # 命名样式只注册一次，之后每个单元格只复制一次样式索引
+        self.style_arrays = {}
+        for key, named_style in styles.items():
+            self.wb.add_named_style(named_style)
+            self.style_arrays[key] = named_style.as_tuple()
+        self.ws = None
+        self.current_row = 1
+        self.merges = []
+        self.missing_rows = []
+        self.missing_cols = None
     
-    # 第4行：时间信息
-    ws['A4'] = f'时间段：{year}年{month}月1日-{year}年{month}月{days_in_month}日'
-    ws['A4'].font = cell_font
+    @abstractmethod
+    def _create_sheet(self):
+        """创建并返回下一个工作表"""
     
-    # 第5行：空行
-    ws['A5'] = ''
+    @abstractmethod
+    def append(self, values, style=None, width=None, skip_cols=()):
+        """在当前工作表末尾写入一行；skip_cols 中值为空的列不写出单元格"""
+    
+    def add_sheet(self, title=None):
+        """开始一个新工作表，之后的写入都在该表上进行"""
+        from openpyxl.utils import get_column_letter
+        self._finish_sheet()
+        self.ws = self._create_sheet()
+        if title:
+            self.ws.title = title
+        self.current_row = 1
+        self.merges = []
+        self.missing_rows = []
+        # write_only 模式下列宽必须在写入第一行之前设置
+        for col in range(1, self.last_col + 1):
+            self.ws.column_dimensions[get_column_letter(col)].width = get_column_width(col)
+    
+    def merge(self, min_col, min_row, max_col, max_row):
+        """登记合并区域，当前工作表写完后统一批量注册"""
+        self.merges.append((min_col, min_row, max_col, max_row))
+    
+    def style_id(self, key):
+        """样式简称在工作簿中的单元格样式序号，即写出的 XML 中单元格的 s 属性
+        
+        使用 openpyxl 的内部样式表 wb._cell_styles，已验证的版本范围见 requirements.txt。
+        """
+        return self.wb._cell_styles.add(self.style_arrays[key])
+    
+    def _register_pair(self, merge_cols, missing_cols):
+        first_row = self.current_row
+        self.merges.extend((col, first_row, col, first_row + 1) for col in merge_cols)
+        if missing_cols:
+            self.missing_rows.append(first_row)
+            self.missing_cols = missing_cols
     
-    # 第6行：星期标题行
-    current_col = 1
-    ws.cell(row=6, column=current_col, value='员工姓名')
-    ws.cell(row=6, column=current_col+1, value='岗位')
-    ws.cell(row=6, column=current_col+2, value='')
-    current_col += 3
+    def set_row_style(self, key):
+        """设置当前行的默认样式（customFormat），该行没有写出的单元格显示为这个样式"""
+        self.ws.row_dimensions[self.current_row]._style = copy(self.style_arrays[key])
+    
+    def append_pair(self, check_in_row, check_out_row, style, merge_cols, missing_cols=None):
+        """写入一个员工的签到、签退两行，并登记需要两行纵向合并的列
+        
+        missing_cols 为 (首列, 末列) 时，这两行在该范围内空白的签到签退单元格标记为数据缺失。
+        签退行中纵向合并区域的下半部分不逐个写出单元格，由行默认样式提供边框。
+        """
+        self._register_pair(merge_cols, missing_cols)
+        self.append(check_in_row, style)
+        self.set_row_style(MERGED_ROW_STYLE)
+        self.append(check_out_row, style, skip_cols=set(merge_cols))
+    
+    def reserve_pair(self, merge_cols, missing_cols=None):
+        """只登记一个员工两行的合并区域和数据缺失标记并跳过这两行，单元格由 insert_workbook_rows 写入"""
+        self._register_pair(merge_cols, missing_cols)
+        self.current_row += 2
+    
+    def _finish_sheet(self):
+        from openpyxl.worksheet.cell_range import CellRange
+        if self.ws is None:
+            return
+        if self.merges:
+            register_merged_ranges(self.ws, [CellRange(min_col=min_col, min_row=min_row, max_col=max_col,
+                                                       max_row=max_row)
+                                             for min_col, min_row, max_col, max_row in self.merges])
+            self.merges = []
+        if self.missing_rows:
+            add_missing_format(self.ws, build_missing_sqref(self.missing_rows, *self.missing_cols))
+            self.missing_rows = []
+    
+    def save(self, output_file):
+        self._finish_sheet()
+        self.wb.save(output_file)
+
+class SheetWriter(_BaseSheetWriter):
+    """普通模式：在内存中的工作表上按行写入单元格"""
+    
+    def __init__(self, styles, last_col):
+        from openpyxl import Workbook
+        super().__init__(Workbook(), styles, last_col)
+    
+    def _create_sheet(self):
+        # 第一个工作表使用新建工作簿自带的默认表
+        if self.ws is None:
+            return self.wb.active
+        return self.wb.create_sheet()
+    
+    def append(self, values, style=None, width=None, skip_cols=()):
+        """写入一行
+        
+        style 为样式简称，或与各列一一对应的样式简称列表；
+        width 为应用样式的列数（默认与 values 等长）；skip_cols 中值为空的列不创建单元格。
+        """
+        ws = self.ws
+        row = self.current_row
+        if not style:
+            for col, value in enumerate(values, 1):
+                ws.cell(row=row, column=col, value=value)
+        else:
+            if isinstance(style, str):
+                style = [style] * (width or len(values))
+            for col, key in enumerate(style, 1):
+                value = values[col - 1] if col <= len(values) else None
+                if value is None and col in skip_cols:
+                    continue
+                cell = ws.cell(row=row, column=col, value=value)
+                cell._style = copy(self.style_arrays[key])
+        self.current_row += 1
+
+class StreamingSheetWriter(_BaseSheetWriter):
+    """流式模式：使用 write_only 工作表按行顺序输出表头和汇总表，员工行在保存后分批写入（见 render_workbook）"""
+    
+    def __init__(self, styles, last_col):
+        from openpyxl import Workbook
+        super().__init__(Workbook(write_only=True), styles, last_col)
+    
+    def _create_sheet(self):
+        return self.wb.create_sheet()
+    
+    def append(self, values, style=None, width=None, skip_cols=()):
+        """写入一行，参数含义与 SheetWriter.append 相同"""
+        from openpyxl.cell import WriteOnlyCell
+        if not style:
+            self.ws.append(values)
+        else:
+            if isinstance(style, str):
+                style = [style] * (width or len(values))
+            row = []
+            for col, key in enumerate(style):
+                value = values[col] if col < len(values) else None
+                if value is None and col + 1 in skip_cols:
+                    # 没有样式的空值不会写出
+                    row.append(None)
+                    continue
+                cell = WriteOnlyCell(self.ws, value=value)
+                cell._style = copy(self.style_arrays[key])
+                row.append(cell)
+            self.ws.append(row)
+        self.current_row += 1
+
+def get_sheet_title(position, used_titles):
+    """按岗位生成合法且不重复的工作表名（不超过31个字符，不含 []:*?/\\）"""
+    title = re.sub(r'[\[\]:*?/\\]', '_', position).strip() or '未分组'
+    title = title[:31]
+    base, n = title, 2
+    while title in used_titles:
+        suffix = f'({n})'
+        title = base[:31 - len(suffix)] + suffix
+        n += 1
+    used_titles.add(title)
+    return title
+
+def build_day_headers(year, month, days_in_month):
+    """生成第6行星期标题和第7行日期行
+    
+    返回 (星期标题行, 日期行, day_columns, day_labels)，
+    day_columns[day] / day_labels[day] 为每天的签到签退列号和日期文字。
+    """
+    weekday_row = ['员工姓名', '岗位', '']
+    date_row = [None, None, None]
     
     # 生成指定年月的日期列（每天两列：签到签退列 + 工作时长列）
+    day_columns = [None] * (days_in_month + 1)
+    day_labels = [None] * (days_in_month + 1)
     start_date = datetime(year, month, 1)
     for day in range(days_in_month):
         current_date = start_date + timedelta(days=day)
         weekday = get_weekday_name(current_date)
         date_str = f"{current_date.month}月{current_date.day}日"
+        day_columns[current_date.day] = len(weekday_row) + 1
+        day_labels[current_date.day] = date_str
         
         # 每天两列：签到签退列 + 工作时长列
-        ws.cell(row=6, column=current_col, value=weekday)
-        ws.cell(row=7, column=current_col, value=date_str)
-        current_col += 1
-        
-        # 工作时长列
-        ws.cell(row=6, column=current_col, value='工作时长')
-        ws.cell(row=7, column=current_col, value='(小时)')
-        current_col += 1
+        weekday_row.extend([weekday, '工作时长'])
+        date_row.extend([date_str, '(小时)'])
     
     # 添加其他列
-    ws.cell(row=6, column=current_col, value='累计时长')
-    ws.cell(row=6, column=current_col+1, value='休息天数')
-    ws.cell(row=6, column=current_col+2, value='备注')
-    
-    # 应用样式到表头
-    for col in range(1, current_col + 3):
-        for row in range(6, 8):
-            cell = ws.cell(row=row, column=col)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-            cell.alignment = center_alignment
+    weekday_row.extend(['累计时长', '休息天数', '备注'])
+    return weekday_row, date_row, day_columns, day_labels
+
+def get_last_punch_col(day):
+    """第 day 天签到签退列的列号（第1天为 D 列，每天两列）"""
+    return 2 + day * 2
+
+def write_sheet_header(writer, year, month, days_in_month, weekday_row, date_row):
+    """写入第1-7行：标题、公司信息、时间段和两行表头"""
+    # 第1行：标题
+    writer.merge(1, 1, 26, 1)
+    writer.append(['考勤表-上下班工时统计表'], 'title')
     
-    # 创建员工数据行
-    print("正在创建员工数据行...")
-    current_row = 8
-    
-    for i, (employee, position) in enumerate(zip(employees, positions)):
-        # 签到行
-        ws.cell(row=current_row, column=1, value=employee)
-        ws.cell(row=current_row, column=2, value=position)
-        ws.cell(row=current_row, column=3, value='签到')
-        
-        # 签退行
-        ws.cell(row=current_row+1, column=1, value='')  # 员工姓名留空，后续合并
-        ws.cell(row=current_row+1, column=2, value='')  # 岗位留空，后续合并
-        ws.cell(row=current_row+1, column=3, value='签退')
-        
-        # 合并员工姓名单元格（两行合并）
-        ws.merge_cells(f'A{current_row}:A{current_row+1}')
-        ws.cell(row=current_row, column=1).alignment = center_alignment
-        
-        # 合并岗位单元格（两行合并）
-        ws.merge_cells(f'B{current_row}:B{current_row+1}')
-        ws.cell(row=current_row, column=2).alignment = center_alignment
-        
-        # 应用样式
-        for col in range(1, current_col + 3):
-            for row in range(current_row, current_row + 2):
-                cell = ws.cell(row=row, column=col)
-                cell.font = cell_font
-                cell.border = border
-                cell.alignment = center_alignment
-        
-        current_row += 2
+    # 第2行：公司信息
+    writer.merge(1, 2, 26, 2)
+    writer.append(['公司名称：武汉福福数通网络科技有限公司'], 'company')
     
-    # 填充所有员工的数据
-    print("正在填充所有员工的打卡数据...")
+    # 第3行：空行
+    writer.append([])
     
-    total_processed = 0
-    for employee in employees:
-        # 找到员工在打卡时间表中的行
-        punch_row = df_punch[df_punch.iloc[:, 0] == employee]
-        if not punch_row.empty:
-            punch_row = punch_row.iloc[0]
-            
-            # 找到员工在新表中的行
-            employee_new_row = None
-            for row in range(8, current_row, 2):
-                if ws.cell(row=row, column=1).value == employee:
-                    employee_new_row = row
-                    break
+    # 第4行：时间信息
+    writer.append([f'时间段：{year}年{month}月1日-{year}年{month}月{days_in_month}日'], 'info')
+    
+    # 第5行：空行
+    writer.append([])
+    
+    # 第6行：星期标题行，第7行：日期行
+    writer.append(weekday_row, 'header', writer.last_col)
+    writer.append(date_row, 'header', writer.last_col)
+
+def parse_clock(text):
+    """把 'HH:MM' 解析为当天的分钟数，用于命令行参数"""
+    match = re.fullmatch(r'(\d{1,2}):([0-5]\d)', text.strip())
+    if not match or int(match.group(1)) > 23:
+        raise ValueError(f'无效的时间：{text}')
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+class ShiftRules:
+    """考勤统计规则：上班、下班时间（当天分钟数）和每天工作多少小时以上算加班
+    
+    overtime_after 默认为上班到下班的时长。
+    """
+    __slots__ = ('start', 'end', 'overtime_after')
+    
+    def __init__(self, start=9 * 60, end=18 * 60, overtime_after=None):
+        self.start = start
+        self.end = end
+        self.overtime_after = (end - start) / 60.0 if overtime_after is None else overtime_after
+    
+    def __repr__(self):
+        return f'ShiftRules({self.start}, {self.end}, {self.overtime_after})'
+
+def compute_employee_stats(punch_matrix, days=None, rules=None):
+    """在打卡矩阵 (员工, 天) 上一次性计算每个员工的统计值，只统计前 days 天
+    
+    返回 {名称: 每个员工一个值的数组}：打卡天数、工作天数、累计时长、休息天数（没有任何打卡的天数），
+    指定 rules 时另有迟到次数、早退次数、加班时长和缺卡次数（只有签到没有签退的天数）。
+    迟到按签到晚于上班时间、早于下班时间计，下班时间之后签到的夜班不算迟到；
+    早退按签退早于下班时间计，跨天下班不算早退。
+    """
+    import numpy as np
+    days = punch_matrix.check_in.shape[1] if days is None else days
+    check_in = punch_matrix.check_in[:, :days]
+    check_out = punch_matrix.check_out[:, :days]
+    present = punch_matrix.present()[:, :days]
+    worked = punch_matrix.worked()[:, :days]
+    minutes = punch_matrix.work_minutes()[:, :days]
+    stats = {
+        'processed': present.sum(axis=1),
+        'work_days': worked.sum(axis=1),
+        'total_hours': punch_matrix.work_hours()[:, :days].sum(axis=1),
+        'rest_days': days - present.sum(axis=1),
+    }
+    if rules is not None:
+        valid = minutes > 0
+        stats['late'] = (present & (check_in > rules.start) & (check_in < rules.end)).sum(axis=1)
+        stats['early'] = (valid & (check_out >= check_in) & (check_out < rules.end)).sum(axis=1)
+        overtime = np.maximum(minutes.astype(np.int32) - round(rules.overtime_after * 60), 0)
+        stats['overtime'] = overtime.sum(axis=1) / 60.0
+        stats['missing'] = (present & ~worked).sum(axis=1)
+    return stats
+
+def format_stats_remark(stats, i):
+    """备注列的统计文字"""
+    return (f"迟到{stats['late'][i]}次 早退{stats['early'][i]}次 "
+            f"加班{stats['overtime'][i]:.2f}小时 缺卡{stats['missing'][i]}次")
+
+def build_employee_rows(roster, punch_matrix, year, month, days_in_month, log_days=False, through_day=None,
+                        rules=None):
+    """生成一批员工的签到、签退两行内容
+    
+    roster 为 [(员工键, 岗位, 是否有打卡记录)]，punch_matrix 为其中有打卡记录的员工
+    按顺序排列的打卡矩阵 (人数, 天数)。
+    返回 ([(签到行, 签退行, 需要两行合并的列)], 员工汇总)，员工汇总为
+    [(姓名, 岗位, 打卡天数, 累计时长, 工作天数, 每天明细)]，每天明细只在 log_days 时收集。
+    through_day 用于按日追加：只填写到这一天，累计值都截至这一天。
+    指定 rules（ShiftRules）时在备注列填写迟到、早退、加班和缺卡统计。
+    """
+    _, _, day_columns, day_labels = build_day_headers(year, month, days_in_month)
+    summary_col = 4 + days_in_month * 2  # 累计时长列
+    last_col = summary_col + 2  # 备注列
+    
+    fill_days = days_in_month if through_day is None else through_day
+    
+    # 工作时长和各项统计都在打卡矩阵上整体计算；打卡文字只在记录每天明细时需要
+    check_ins = punch_matrix.punch_values(0)
+    check_outs = punch_matrix.punch_values(1)
+    if log_days:
+        check_in_texts = punch_matrix.punch_texts(0)
+        check_out_texts = punch_matrix.punch_texts(1)
+    worked = punch_matrix.worked()
+    daily_hours_block = punch_matrix.work_hours().round(EXCEL_DECIMALS)
+    stats = compute_employee_stats(punch_matrix, fill_days, rules)
+    processed_counts = stats['processed'].tolist()
+    work_day_counts = stats['work_days'].tolist()
+    rest_day_counts = stats['rest_days'].tolist()
+    total_hours = stats['total_hours']
+    written_total_hours = total_hours.round(EXCEL_DECIMALS)
+    
+    employee_rows = []
+    summaries = []
+    i = 0  # 已匹配员工在批量结果中的下标
+    for employee_key, position, has_punch in roster:
+        employee = employee_key[0]
+        
+        # 签到行 / 签退行，员工姓名和岗位在签退行留空，后续合并
+        check_in_row = [employee, position, '签到'] + [None] * (last_col - 3)
+        check_out_row = [None, None, '签退'] + [None] * (last_col - 3)
+        merge_cols = [1, 2]
+        
+        if has_punch:
+            day_records = [] if log_days else None
             
-            if employee_new_row:
-                employee_processed_count = 0
+            for day in range(1, days_in_month + 1):
+                if day > fill_days:
+                    # 还没有追加的日期留空，工作时长列照常合并
+                    merge_cols.append(day_columns[day] + 1)
+                    continue
                 
-                # 处理指定天数的数据
-                total_work_hours = 0  # 累计工作时长
-                work_days = 0  # 工作天数
+                # 对应的签到签退列（每天两列：签到签退列 + 工作时长列），缺失时留空
+                col = day_columns[day]
+                check_in_row[col - 1] = check_ins[i, day - 1]
+                check_out_row[col - 1] = check_outs[i, day - 1]
                 
-                for day in range(1, days_in_month + 1):
-                    target_date = datetime(year, month, day)
-                    date_str = f"{target_date.month}月{target_date.day}日"
-                    
-                    # 查找打卡时间
-                    punch_col = ('打卡时间', str(day))
-                    check_in, check_out = None, None
+                # 填入当天工作时长（合并单元格），工作时长列在签到签退列的右边
+                hours_col = col + 1
+                if worked[i, day - 1]:
+                    daily_hours = daily_hours_block[i, day - 1]
+                    check_in_row[hours_col - 1] = daily_hours
                     
-                    if punch_col in df_punch.columns:
-                        punch_time = punch_row[punch_col]
-                        check_in, check_out = parse_punch_times(punch_time)
-                        if check_in or check_out:
-                            employee_processed_count += 1
-                    
-                    # 找到对应的签到签退列（每天两列：签到签退列 + 工作时长列）
-                    for col in range(4, current_col, 2):  # 每次跳2列，因为每天有2列
-                        if ws.cell(row=7, column=col).value == date_str:
-                            # 签到行
-                            if check_in:
-                                ws.cell(row=employee_new_row, column=col, value=check_in)
-                            else:
-                                ws.cell(row=employee_new_row, column=col, value='数据缺失')
-                            # 签退行
-                            if check_out:
-                                ws.cell(row=employee_new_row+1, column=col, value=check_out)
-                            else:
-                                ws.cell(row=employee_new_row+1, column=col, value='数据缺失')
-                            
-                            # 计算当天工作时长并填入工作时长列
-                            hours_col = col + 1  # 工作时长列在签到签退列的右边
-                            
-                            if check_in and check_out:
-                                daily_hours = calculate_work_hours(check_in, check_out)
-                                total_work_hours += daily_hours
-                                work_days += 1
-                                
-                                # 填入工作时长（合并单元格）
-                                ws.cell(row=employee_new_row, column=hours_col, value=f"{daily_hours:.2f}")
-                                ws.cell(row=employee_new_row+1, column=hours_col, value='')  # 签退行留空
-                                
-                                print(f"{employee} {date_str}: 签到{check_in} 签退{check_out} 工作时长{daily_hours:.2f}小时")
-                            else:
-                                # 即使没有工作时长，也要合并单元格并留空
-                                ws.cell(row=employee_new_row, column=hours_col, value='')
-                                ws.cell(row=employee_new_row+1, column=hours_col, value='')
-                            
-                            # 始终合并工作时长单元格（两行合并）
-                            ws.merge_cells(f'{get_column_letter(hours_col)}{employee_new_row}:{get_column_letter(hours_col)}{employee_new_row+1}')
-                            ws.cell(row=employee_new_row, column=hours_col).alignment = center_alignment
-                            
-                            break
+                    if log_days:
+                        day_records.append((day, check_in_texts[i, day - 1], check_out_texts[i, day - 1],
+                                            daily_hours))
                 
-                if employee_processed_count > 0:
-                    total_processed += employee_processed_count
-                    print(f"{employee}: 处理了 {employee_processed_count} 天有打卡记录的日期")
-                    
-                    # 填入累计时长（合并单元格，像工作时长一样）
-                    summary_col = current_col  # 累计时长列
-                    ws.cell(row=employee_new_row, column=summary_col, value=f"{total_work_hours:.2f}")
-                    ws.cell(row=employee_new_row+1, column=summary_col, value='')  # 签退行留空
-                    
-                    # 合并累计时长单元格（两行合并）
-                    ws.merge_cells(f'{get_column_letter(summary_col)}{employee_new_row}:{get_column_letter(summary_col)}{employee_new_row+1}')
-                    ws.cell(row=employee_new_row, column=summary_col).alignment = center_alignment
-                    
-                    print(f"{employee}: 累计工作时长 {total_work_hours:.2f} 小时，工作天数 {work_days} 天")
+                # 始终合并工作时长单元格（两行合并），没有工作时长时留空
+                merge_cols.append(hours_col)
+            
+            if processed_counts[i] > 0:
+                # 填入累计时长、休息天数和备注（合并单元格，像工作时长一样）
+                check_in_row[summary_col - 1] = written_total_hours[i]
+                check_in_row[summary_col] = rest_day_counts[i]
+                if rules is not None:
+                    check_in_row[summary_col + 1] = format_stats_remark(stats, i)
+                
+                summaries.append((employee, position, processed_counts[i], float(total_hours[i]),
+                                  work_day_counts[i], day_records))
+            if processed_counts[i] > 0 or through_day is not None:
+                # 按日追加时汇总列始终合并，之后追加不需要改动合并区域
+                merge_cols.extend([summary_col, summary_col + 1, summary_col + 2])
+            i += 1
+        
+        employee_rows.append((check_in_row, check_out_row, merge_cols))
+    
+    return employee_rows, summaries
+
+def serialize_employee_rows(employee_rows, first_rows, style_ids, row_style_id):
+    """把每个员工的签到、签退两行转换为工作表 XML（两个 <row> 元素），返回与 employee_rows 对应的列表
+    
+    first_rows 为各员工签到行的行号，style_ids 为每列单元格的样式序号；
+    与 append_pair 相同，签退行使用 row_style_id 作为行默认样式，不写出纵向合并区域下半部分的空单元格。
+    """
+    from openpyxl.utils import get_column_letter
+    letters = [get_column_letter(col) for col in range(1, len(style_ids) + 1)]
+    result = []
+    for (check_in_row, check_out_row, merge_cols), first_row in zip(employee_rows, first_rows):
+        parts = []
+        skip_cols = set(merge_cols)
+        for row, values, skip in ((first_row, check_in_row, ()), (first_row + 1, check_out_row, skip_cols)):
+            values = list(values[:len(style_ids)]) + [None] * (len(style_ids) - len(values))
+            cells = ''.join(_cell_xml(f'{letter}{row}', style, value)
+                            for col, (letter, style, value) in enumerate(zip(letters, style_ids, values), 1)
+                            if value is not None or col not in skip)
+            attrs = f' customFormat="1" s="{row_style_id}"' if skip else ''
+            parts.append(f'<row r="{row}"{attrs}>{cells}</row>')
+        result.append(''.join(parts))
+    return result
+
+def build_employee_rows_xml(roster, punch_matrix, first_rows, style_ids, row_style_id, year, month, days_in_month,
+                            log_days=False, through_day=None, rules=None):
+    """生成员工行并直接转换为 XML，返回 (每个员工的行 XML, 每个员工需要合并的列, 员工汇总)"""
+    employee_rows, summaries = build_employee_rows(roster, punch_matrix, year, month, days_in_month, log_days,
+                                                   through_day, rules)
+    return (serialize_employee_rows(employee_rows, first_rows, style_ids, row_style_id),
+            [merge_cols for _, _, merge_cols in employee_rows], summaries)
+
+def build_employee_rows_parallel(roster, punch_matrix, first_rows, style_ids, row_style_id, year, month,
+                                 days_in_month, jobs, log_days=False, through_day=None, rules=None):
+    """把员工列表按顺序切成分片，在多个进程中生成各分片的行 XML，再按原顺序拼接
+    
+    单元格的序列化（openpyxl 中最慢的部分）也在子进程中完成；每个子进程只拿到自己那部分员工的打卡矩阵，
+    拼接结果与分片数无关。返回值与 build_employee_rows_xml 相同。
+    """
+    import numpy as np
+    shard_count = max(1, min(jobs, len(roster)))
+    bounds = [len(roster) * n // shard_count for n in range(shard_count + 1)]
+    # 每个分片在 punch_matrix 中的起始行 = 之前有打卡记录的员工数
+    block_offsets = np.concatenate([[0], np.cumsum([has_punch for _, _, has_punch in roster])])
+    
+    row_xml = []
+    merge_cols = []
+    summaries = []
+    with ProcessPoolExecutor(max_workers=shard_count) as executor:
+        futures = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            shard_matrix = punch_matrix.take(np.arange(block_offsets[start], block_offsets[end]))
+            futures.append(executor.submit(build_employee_rows_xml, roster[start:end], shard_matrix,
+                                           first_rows[start:end], style_ids, row_style_id, year, month,
+                                           days_in_month, log_days, through_day, rules))
+        for future in futures:
+            shard_xml, shard_merge_cols, shard_summaries = future.result()
+            row_xml.extend(shard_xml)
+            merge_cols.extend(shard_merge_cols)
+            summaries.extend(shard_summaries)
+    return row_xml, merge_cols, summaries
+
+# 流式模式每批生成和写出的员工数
+STREAMING_CHUNK_SIZE = 256
+
+def iter_employee_xml_chunks(roster, punch_matrix, first_rows, style_ids, row_style_id, year, month,
+                             days_in_month, log_days=False, through_day=None, rules=None):
+    """流式模式：按 STREAMING_CHUNK_SIZE 个员工一批生成行 XML 和纵向合并区域，供 stream_workbook_rows 逐批写出
+    
+    roster、punch_matrix、first_rows 为同一个工作表中的员工，含义与 build_employee_rows_xml 相同。
+    依次返回 (行 XML, mergeCell XML, 合并区域数)，同时输出这一批员工的汇总信息。
+    """
+    import numpy as np
+    from openpyxl.utils import get_column_letter
+    letters = [None] + [get_column_letter(col) for col in range(1, len(style_ids) + 1)]
+    # 每批在 punch_matrix 中的起始行 = 之前有打卡记录的员工数
+    block_offsets = np.concatenate([[0], np.cumsum([has_punch for _, _, has_punch in roster])])
+    for start in range(0, len(roster), STREAMING_CHUNK_SIZE):
+        end = min(start + STREAMING_CHUNK_SIZE, len(roster))
+        chunk_matrix = punch_matrix.take(np.arange(block_offsets[start], block_offsets[end]))
+        row_xml, merge_cols, summaries = build_employee_rows_xml(
+            roster[start:end], chunk_matrix, first_rows[start:end], style_ids, row_style_id, year, month,
+            days_in_month, log_days, through_day, rules)
+        log_employee_summaries(summaries, year, month)
+        merges = [f'<mergeCell ref="{letters[col]}{row}:{letters[col]}{row + 1}"/>'
+                  for row, cols in zip(first_rows[start:end], merge_cols) for col in cols]
+        yield ''.join(row_xml).encode(), ''.join(merges).encode(), len(merges)
+
+def log_employee_summaries(summaries, year, month):
+    """输出每个员工的汇总信息；开启明细时先输出该员工每天的打卡记录"""
+    day_labels = build_day_headers(year, month, get_days_in_month(year, month))[3]
+    for employee, position, processed, total_work_hours, work_days, day_records in summaries:
+        for day, check_in, check_out, daily_hours in day_records or ():
+            day_logger.debug(
+                f"{employee} {day_labels[day]}: 签到{check_in} 签退{check_out} 工作时长{daily_hours:.2f}小时",
+                extra={'day_record': {
+                    'employee': employee,
+                    'position': position,
+                    'date': f'{year}-{month:02d}-{day:02d}',
+                    'check_in': check_in,
+                    'check_out': check_out,
+                    'hours': round(float(daily_hours), 2),
+                }}
+            )
+        logger.info(f"{employee}: 处理了 {processed} 天有打卡记录的日期，"
+                    f"累计工作时长 {total_work_hours:.2f} 小时，工作天数 {work_days} 天")
+
+# 汇总工作表：按岗位、部门分组的统计
+ROLLUP_SHEET_TITLE = '汇总'
+ROLLUP_HEADERS = ['人数', '累计时长', '工作天数', '平均每天工时', '数据缺失率']
+ROLLUP_ROW_STYLES = ['cell', 'cell', 'hours', 'cell', 'hours', 'rate']
+
+def build_rollup_rows(roster, departments, employee_matrix, year, month, days):
+    """按岗位和部门分组汇总人数、累计时长、平均每个工作日的工时和数据缺失率
+    
+    在生成主表用的同一个打卡矩阵上整体计算（只统计前 days 天），不需要重新读取输出文件。
+    数据缺失率为没有任何打卡记录的人天数占比，没有打卡记录的员工按整月缺失计。
+    返回汇总工作表的 [(行内容, 样式简称)]。
+    """
+    import numpy as np
+    import pandas as pd
+    has_punch = np.array([has_punch for _, _, has_punch in roster], dtype=bool)
+    stats = compute_employee_stats(employee_matrix, days)
+    frame = pd.DataFrame({
+        '岗位': [employee_key[1] for employee_key, _, _ in roster],
+        '部门': departments[:len(roster)],
+        'hours': np.zeros(len(roster)),
+        'work_days': np.zeros(len(roster), dtype=np.int64),
+        'missing_days': np.full(len(roster), days, dtype=np.int64),
+    })
+    frame.loc[has_punch, 'hours'] = stats['total_hours']
+    frame.loc[has_punch, 'work_days'] = stats['work_days']
+    frame.loc[has_punch, 'missing_days'] = stats['rest_days']
+    
+    def table_row(label, headcount, hours, work_days, missing_days):
+        average = hours / work_days if work_days else 0.0
+        missing_rate = missing_days / (headcount * days) if headcount and days else 0.0
+        return [label or '（未填写）', int(headcount), float(hours), int(work_days), float(average),
+                float(missing_rate)]
+    
+    rows = [([f'考勤汇总：{year}年{month}月1日-{year}年{month}月{days}日'], 'title'), ([], None)]
+    for key in ('岗位', '部门'):
+        groups = frame.groupby(key, sort=False).agg(
+            headcount=('hours', 'size'), hours=('hours', 'sum'),
+            work_days=('work_days', 'sum'), missing_days=('missing_days', 'sum'))
+        rows.append(([key] + ROLLUP_HEADERS, 'header'))
+        for label, group in groups.iterrows():
+            rows.append((table_row(label, *group), ROLLUP_ROW_STYLES))
+        rows.append((table_row('合计', len(frame), frame['hours'].sum(), frame['work_days'].sum(),
+                               frame['missing_days'].sum()), ROLLUP_ROW_STYLES))
+        rows.append(([], None))
+    return rows
+
+def rollup_sheet_updates(rollup_rows, sheet):
+    """增量更新和按日追加时改写汇总工作表中有内容的行（分组由表格布局固定，行号不变）"""
+    return {sheet: {row: dict(enumerate(values, 1))
+                    for row, (values, _) in enumerate(rollup_rows, 1) if values}}
+
+def resolve_excel_engine(engine):
+    """检查 Excel 读取引擎是否可用，calamine 未安装时退回 openpyxl"""
+    if engine == 'calamine':
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            logger.warning("警告：未安装 python-calamine，改用 openpyxl 读取")
+            return 'openpyxl'
+    return engine
+
+def find_punch_columns(group_labels, day_labels, only_day=None):
+    """根据打卡时间表第3-4行表头确定每天的打卡列
+    
+    第3行的“打卡时间”横跨所有日期列（已向后填充），第4行为日期标签，
+    与按 header=[2, 3] 读取时一样按 ('打卡时间', str(day)) 原样匹配。
+    返回长度为 MAX_DAYS 的列表，第 day - 1 项为该日期的列号（0 起），找不到时为 None；
+    指定 only_day 时其余日期都为 None。
+    """
+    day_cols = [None] * MAX_DAYS
+    targets = {str(day): day for day in range(1, MAX_DAYS + 1)}
+    # 同一日期标签出现多次时（如跨月的下月1日）只保留第一列
+    for col, (group, label) in enumerate(zip(group_labels, day_labels)):
+        day = targets.get(label) if group == '打卡时间' and isinstance(label, str) else None
+        if day is not None and day_cols[day - 1] is None and only_day in (None, day):
+            day_cols[day - 1] = col
+    return day_cols
+
+def read_source_data(source_file, engine=None, day=None):
+    """只打开一次数据源文件，读取员工列表和打卡时间
+    
+    月度汇总只读取姓名、岗位、部门三列；打卡时间只读取姓名、岗位和各天的打卡列，
+    指定 day 时只读取这一天的打卡列（其余日期为 None）。
+    返回 (员工列表, 岗位列表, 部门列表, 打卡记录列表)，部门列表与员工列表一一对应（缺失时为空字符串），
+    打卡记录为 PunchRecord。
+    engine 为 'readonly' 时不经过 pandas，见 read_source_data_readonly。
+    """
+    if engine == 'readonly':
+        return read_source_data_readonly(source_file, day)
+    
+    import pandas as pd
+    with pd.ExcelFile(source_file, engine=resolve_excel_engine(engine)) as xls:
+        # 月度汇总：表头在第6-7行，数据从第8行开始
+        df_original = pd.read_excel(xls, sheet_name='月度汇总', header=None, skiprows=7, usecols=[0, 1, 2])
+        
+        # 打卡时间：表头在第3-4行
+        # 表头按原始类型读取（dtype=object），避免 '2' 之类的日期标签被转换成数字
+        df_header = pd.read_excel(xls, sheet_name='打卡时间', header=None, skiprows=2, nrows=2, dtype=object)
+        day_cols = find_punch_columns(df_header.iloc[0].ffill().tolist(), df_header.iloc[1].tolist(), day)
+        punch_cols = sorted(col for col in day_cols if col is not None)
+        
+        df_punch = pd.read_excel(xls, sheet_name='打卡时间', header=None, skiprows=4,
+                                 usecols=[0, 1] + punch_cols)
+    
+    # 按列取出后逐行组装成记录，缺少的日期填 None
+    columns = {col: df_punch[col].tolist() for col in df_punch.columns}
+    missing = [None] * len(df_punch)
+    day_values = [columns[col] if col is not None else missing for col in day_cols]
+    punch_records = [
+        PunchRecord(name, group, punches)
+        for name, group, punches in zip(columns[0], columns[1], zip(*day_values))
+    ]
+    
+    names = df_original.iloc[:, 0]
+    employees = names.dropna().tolist()
+    positions = df_original.iloc[:, 1].dropna().tolist()
+    departments = [_normalize_position(department) for department in df_original.iloc[:, 2][names.notna()]]
+    return employees, positions, departments, punch_records
+
+def _convert_cell(value):
+    """与 pandas 的 openpyxl 引擎一致：空单元格视为缺失，整数值的浮点数转换为 int"""
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _iter_sheet_rows(ws, min_row):
+    """从 min_row 行开始逐行返回单元格值（已按 _convert_cell 转换）"""
+    for row in ws.iter_rows(min_row=min_row, values_only=True):
+        yield [_convert_cell(value) for value in row]
+
+def iter_punch_records(ws, day=None):
+    """逐行读取只读模式下的打卡时间表，生成 PunchRecord
+    
+    表头位置只解析一次，之后每行只取姓名、考勤组和各天的打卡列（指定 day 时只取这一天）。
+    """
+    header_rows = _iter_sheet_rows(ws, 3)
+    group_row = next(header_rows, [])
+    day_row = next(header_rows, [])
+    # 第3行的“打卡时间”只写在第一列，向后填充到第4行的全部列
+    group_labels = []
+    for col in range(max(len(group_row), len(day_row))):
+        value = group_row[col] if col < len(group_row) else None
+        group_labels.append(value if value is not None or not group_labels else group_labels[-1])
+    day_cols = find_punch_columns(group_labels, day_row, day)
+    
+    for row in ws.iter_rows(min_row=5, values_only=True):
+        width = len(row)
+        if not any(value is not None and value != '' for value in row):
+            continue
+        punches = tuple(
+            _convert_cell(row[col]) if col is not None and col < width else None
+            for col in day_cols
+        )
+        yield PunchRecord(_convert_cell(row[0]) if width > 0 else None,
+                          _convert_cell(row[1]) if width > 1 else None,
+                          punches)
+
+def read_source_data_readonly(source_file, day=None):
+    """不经过 pandas，用 openpyxl 只读模式逐行读取员工列表和打卡记录
+    
+    不构建 DataFrame，内存占用只与打卡记录本身有关，返回值与 read_source_data 相同。
+    """
+    from openpyxl import load_workbook
+    wb = load_workbook(source_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        # 月度汇总：数据从第8行开始，只取姓名、岗位、部门三列
+        ws_summary = wb['月度汇总']
+        ws_summary.reset_dimensions()
+        employees = []
+        positions = []
+        departments = []
+        for row in ws_summary.iter_rows(min_row=8, max_col=3, values_only=True):
+            name, position, department = [_convert_cell(value) for value in (list(row) + [None] * 3)[:3]]
+            if name is not None:
+                employees.append(name)
+                departments.append(_normalize_position(department))
+            if position is not None:
+                positions.append(position)
+        
+        ws_punch = wb['打卡时间']
+        ws_punch.reset_dimensions()
+        punch_records = list(iter_punch_records(ws_punch, day))
+    finally:
+        wb.close()
+    return employees, positions, departments, punch_records
+
+# 解析结果缓存：解析逻辑变化时递增版本号，旧缓存自动失效
+PARSER_VERSION = 4
+CACHE_DIR = '.attendance_cache'
+CACHE_MAX_BYTES = 200 * 1024 * 1024  # 缓存目录总大小上限
+CACHE_MAX_AGE_DAYS = 30  # 超过此天数未使用的缓存会被清理
+
+def get_cache_key(source_file, engine=None):
+    """根据文件内容哈希、大小、修改时间、解析版本和读取引擎生成缓存键"""
+    stat = os.stat(source_file)
+    digest = hashlib.sha256()
+    with open(source_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    digest.update(f'|{stat.st_size}|{stat.st_mtime_ns}|{PARSER_VERSION}|{engine}'.encode())
+    return digest.hexdigest()
+
+def _to_str_array(values):
+    """把一列单元格转换为定长字符串数组，缺失值记为空字符串"""
+    import numpy as np
+    return np.array(['' if _is_missing(value) else str(value) for value in values], dtype=str)
+
+def load_cached_source(source_file, engine=None, cache_dir=CACHE_DIR):
+    """读取解析结果缓存，未命中时返回 None"""
+    import numpy as np
+    cache_file = os.path.join(cache_dir, get_cache_key(source_file, engine) + '.npz')
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with np.load(cache_file, allow_pickle=False) as data:
+            employees = data['employees'].tolist()
+            positions = data['positions'].tolist()
+            departments = data['departments'].tolist()
+            punch_names = data['punch_names'].tolist()
+            punch_groups = data['punch_groups'].tolist()
+            check_in = data['check_in']
+            check_out = data['check_out']
+            text_keys = data['text_keys'].tolist()
+            text_values = data['text_values'].tolist()
+    except (OSError, KeyError, ValueError):
+        return None
+    # 更新访问时间，供按时间清理时参考
+    os.utime(cache_file)
+    
+    # 缺失的姓名保存为空字符串
+    punch_matrix = PunchMatrix([name or None for name in punch_names], punch_groups, check_in, check_out,
+                               {tuple(key): text for key, text in zip(text_keys, text_values)})
+    return employees, positions, departments, punch_matrix
+
+def save_cached_source(source_file, source_data, engine=None, cache_dir=CACHE_DIR):
+    """把解析结果以 .npz 列式格式写入缓存目录，并按大小和时间清理旧缓存"""
+    import numpy as np
+    employees, positions, departments, punch_matrix = source_data
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, get_cache_key(source_file, engine) + '.npz')
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.savez_compressed(
+            f,
+            employees=_to_str_array(employees),
+            positions=_to_str_array(positions),
+            departments=_to_str_array(departments),
+            punch_names=_to_str_array(punch_matrix.names),
+            punch_groups=_to_str_array(punch_matrix.groups),
+            check_in=punch_matrix.check_in,
+            check_out=punch_matrix.check_out,
+            text_keys=np.array(list(punch_matrix.texts), dtype=np.int32).reshape(-1, 3),
+            text_values=_to_str_array(punch_matrix.texts.values()),
+        )
+    os.replace(tmp_file, cache_file)
+    evict_cache(cache_dir)
+
+def evict_cache(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age_days=CACHE_MAX_AGE_DAYS):
+    """清理过期缓存，并从最久未使用的开始删除直到总大小不超过上限"""
+    now = time.time()
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.npz'):
+            continue
+        path = os.path.join(cache_dir, name)
+        stat = os.stat(path)
+        if now - stat.st_mtime > max_age_days * 86400:
+            os.remove(path)
+        else:
+            entries.append((stat.st_mtime, stat.st_size, path))
+    
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+def read_source_data_cached(source_file, engine=None, use_cache=True):
+    """读取数据源并把打卡记录解析为打卡矩阵，返回 (员工列表, 岗位列表, 部门列表, PunchMatrix)
+    
+    文件未变化时直接使用上次的解析结果。
+    """
+    if use_cache:
+        cached = load_cached_source(source_file, engine)
+        if cached is not None:
+            logger.info("数据源文件未变化，使用解析缓存")
+            return cached
+    employees, positions, departments, punch_records = read_source_data(source_file, engine)
+    source_data = (employees, positions, departments, PunchMatrix.from_records(punch_records))
+    if use_cache:
+        try:
+            save_cached_source(source_file, source_data, engine)
+        except OSError as e:
+            logger.warning(f"警告：写入解析缓存失败 - {e}")
+    return source_data
+
+# 增量更新：记录上次生成时每个员工打卡数据的指纹，下次只改写有变化的员工行
+FINGERPRINT_VERSION = 4
+# 以下按 openpyxl 写出的工作表 XML 格式匹配和改写，已验证的版本范围见 requirements.txt
+_SHEET_ROW_PATTERN = re.compile(rb'<row r="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+_SHEET_CELL_PATTERN = re.compile(rb'<c r="([A-Z]+)\d+"([^>]*?)(?:/>|>.*?</c>)', re.S)
+_CELL_STYLE_PATTERN = re.compile(rb'\ss="(\d+)"')
+_MISSING_SQREF_PATTERN = re.compile(rb'<conditionalFormatting sqref="[^"]*"')
+
+def get_fingerprint_file(output_file):
+    """指纹文件与输出文件放在一起"""
+    return output_file + '.fingerprint.json'
+
+def get_employee_sheet_rows(roster, sheet_per_position=False):
+    """每个员工签到行所在的 (工作表序号, 行号)，与写入工作表时的顺序一致
+    
+    分表按员工键中的岗位（考勤组）划分：岗位在两张表中都有，也是员工匹配和布局指纹的一部分；
+    部门只在月度汇总中有且可能为空，不用于分表。
+    """
+    if not sheet_per_position:
+        return [(0, 8 + i * 2) for i in range(len(roster))]
+    sheet_indexes = {}
+    sheet_counts = []
+    rows = []
+    for employee_key, _, _ in roster:
+        sheet = sheet_indexes.setdefault(employee_key[1], len(sheet_indexes))
+        if sheet == len(sheet_counts):
+            sheet_counts.append(0)
+        rows.append((sheet, 8 + sheet_counts[sheet] * 2))
+        sheet_counts[sheet] += 1
+    return rows
+
+def get_rollup_sheet_index(roster, sheet_per_position=False):
+    """汇总工作表排在所有员工工作表之后"""
+    if not sheet_per_position:
+        return 1
+    return len({employee_key[1] for employee_key, _, _ in roster})
+
+def build_layout_signature(roster, year, month, days_in_month, sheet_per_position=False, rules=None,
+                           departments=None):
+    """表格布局的指纹：员工顺序、岗位、工作表划分、统计规则、汇总表分组或月份变化时需要完整重新生成
+    
+    departments 只在输出汇总工作表时传入。
+    """
+    layout = [FINGERPRINT_VERSION, year, month, days_in_month, bool(sheet_per_position), repr(rules),
+              None if departments is None else [str(department) for department in departments],
+              [[str(part) for part in employee_key] + [str(position), bool(has_punch)]
+               for employee_key, position, has_punch in roster]]
+    return hashlib.sha256(json.dumps(layout, ensure_ascii=False).encode()).hexdigest()
+
+def build_employee_digests(roster, employee_matrix):
+    """每个员工打卡数据（签到、签退分钟数和原始文字）的指纹
+    
+    返回 (指纹列表, 是否填写累计时长列表)，没有打卡记录的员工指纹为空字符串。
+    """
+    has_summary = employee_matrix.present().any(axis=1).tolist()
+    summaries = []
+    row_texts = {}
+    for (row, day, kind), text in employee_matrix.texts.items():
+        row_texts.setdefault(row, []).append((day, kind, text))
+    digests = []
+    i = 0  # 已匹配员工在打卡矩阵中的下标
+    for _, _, has_punch in roster:
+        if not has_punch:
+            digests.append('')
+            summaries.append(False)
+            continue
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(employee_matrix.check_in[i].tobytes())
+        digest.update(employee_matrix.check_out[i].tobytes())
+        digest.update(repr(sorted(row_texts.get(i, []))).encode())
+        digests.append(digest.hexdigest())
+        summaries.append(has_summary[i])
+        i += 1
+    return digests, summaries
+
+def save_fingerprint(output_file, layout, digests, summaries):
+    """记录本次生成的布局和员工指纹，以及输出文件的大小和修改时间"""
+    stat = os.stat(output_file)
+    fingerprint = {
+        'layout': layout,
+        'digests': digests,
+        'summaries': summaries,
+        'output_size': stat.st_size,
+        'output_mtime_ns': stat.st_mtime_ns,
+    }
+    with open(get_fingerprint_file(output_file), 'w', encoding='utf-8') as f:
+        json.dump(fingerprint, f)
+
+def load_fingerprint(output_file):
+    """读取上次的指纹；输出文件不存在或在上次生成后被改动过时返回 None"""
+    fingerprint_file = get_fingerprint_file(output_file)
+    if not os.path.exists(output_file) or not os.path.exists(fingerprint_file):
+        return None
+    try:
+        with open(fingerprint_file, encoding='utf-8') as f:
+            fingerprint = json.load(f)
+        stat = os.stat(output_file)
+        if (fingerprint['output_size'], fingerprint['output_mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    return fingerprint
+
+def _cell_xml(ref, style, value):
+    """生成一个单元格的 XML，文字使用内联字符串，不改动共享字符串表"""
+    attrs = f' r="{ref}"' + (f' s="{style}"' if style else '')
+    if value is None or value == '':
+        return f'<c{attrs}/>'
+    if isinstance(value, float):
+        # 与 openpyxl 写入的精度一致
+        return f'<c{attrs}><v>{value:.16g}</v></c>'
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f'<c{attrs}><v>{value}</v></c>'
+    text = str(value)
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return f'<c{attrs} t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+def _row_xml(old_row, row, values):
+    """改写一行中指定列的单元格值，保留原样式；其余单元格原样保留
+    
+    values 为 {列号: 值}，原行中没有的单元格按列顺序插入。
+    """
+    from openpyxl.utils import column_index_from_string, get_column_letter
+    if len(values) <= 4:
+        # 只改几个单元格时（按日追加）直接按单元格引用定位，不解析整行
+        for col, value in values.items():
+            ref = f'{get_column_letter(col)}{row}'
+            start = old_row.find(b'<c r="' + ref.encode() + b'"')
+            if start < 0:
+                break
+            tag_end = old_row.index(b'>', start) + 1
+            end = tag_end if old_row[tag_end - 2:tag_end] == b'/>' else old_row.index(b'</c>', tag_end) + 4
+            style = _CELL_STYLE_PATTERN.search(old_row, start, tag_end)
+            cell = _cell_xml(ref, style.group(1).decode() if style else None, value).encode()
+            old_row = old_row[:start] + cell + old_row[end:]
+        else:
+            return old_row
+    cells = {}
+    styles = {}
+    for cell in _SHEET_CELL_PATTERN.finditer(old_row):
+        col = column_index_from_string(cell.group(1).decode())
+        style = _CELL_STYLE_PATTERN.search(cell.group(2))
+        cells[col] = cell.group(0)
+        styles[col] = style.group(1).decode() if style else None
+    for col, value in values.items():
+        # 原行中没有的空单元格（签退行纵向合并区域的下半部分）保持不写出，由行默认样式显示
+        if value is None and col not in cells:
+            continue
+        cells[col] = _cell_xml(f'{get_column_letter(col)}{row}', styles.get(col), value).encode()
+    open_tag = old_row[:old_row.index(b'>') + 1].rstrip(b'/>') + b'>'
+    return open_tag + b''.join(cells[col] for col in sorted(cells)) + b'</row>'
+
+def patch_workbook_rows(output_file, sheet_updates, missing_sqrefs=None):
+    """直接改写 xlsx 中工作表 XML 的指定单元格，其余内容原样保留
+    
+    sheet_updates 为 {工作表序号: {行号: {列号: 值}}}，只能改写已存在的行；
+    missing_sqrefs 为 {工作表序号: sqref}，改写该工作表数据缺失条件格式的范围。
+    成功返回 True；找不到工作表、行或条件格式时返回 False，文件保持不变。
+    """
+    import zipfile
+    missing_sqrefs = missing_sqrefs or {}
+    with zipfile.ZipFile(output_file) as source:
+        patched = {}
+        for sheet, row_updates in sheet_updates.items():
+            sheet_name = f'xl/worksheets/sheet{sheet + 1}.xml'
+            try:
+                xml = source.read(sheet_name)
+            except KeyError:
+                return False
+            rows = {int(match.group(1)): match for match in _SHEET_ROW_PATTERN.finditer(xml)}
+            if any(row not in rows for row in row_updates):
+                return False
+            if sheet in missing_sqrefs:
+                # 条件格式在 sheetData 之后，替换 sqref 不影响前面各行的位置
+                xml, count = _MISSING_SQREF_PATTERN.subn(
+                    b'<conditionalFormatting sqref="' + missing_sqrefs[sheet].encode() + b'"', xml, count=1)
+                if not count:
+                    return False
+            parts = []
+            last_end = 0
+            for row in sorted(row_updates):
+                match = rows[row]
+                parts.append(xml[last_end:match.start()])
+                parts.append(_row_xml(match.group(0), row, row_updates[row]))
+                last_end = match.end()
+            parts.append(xml[last_end:])
+            patched[sheet_name] = b''.join(parts)
+        _rewrite_workbook(source, output_file, patched)
+    return True
+
+def _rewrite_workbook(source, output_file, patched):
+    """把 xlsx 中的部分文件替换为 patched 中的内容，先写临时文件再替换原文件"""
+    import zipfile
+    tmp_file = output_file + '.tmp'
+    with zipfile.ZipFile(tmp_file, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            target.writestr(info, patched.get(info.filename) or source.read(info.filename))
+    source.close()
+    os.replace(tmp_file, output_file)
+
+def append_workbook_rows(output_file, sheet, template_row, rows):
+    """在工作表末尾直接追加多行 XML，单元格样式与 template_row 行相同
+    
+    用于行数很多、样式固定的表格：只有表头和模板行经过 openpyxl，其余行不再逐个创建单元格对象。
+    """
+    import zipfile
+    from openpyxl.utils import get_column_letter
+    sheet_name = f'xl/worksheets/sheet{sheet + 1}.xml'
+    with zipfile.ZipFile(output_file) as source:
+        xml = source.read(sheet_name)
+        template = next(match.group(0) for match in _SHEET_ROW_PATTERN.finditer(xml)
+                        if int(match.group(1)) == template_row)
+        styles = {}
+        for cell in _SHEET_CELL_PATTERN.finditer(template):
+            style = _CELL_STYLE_PATTERN.search(cell.group(2))
+            styles[cell.group(1).decode()] = style.group(1).decode() if style else None
+        letters = [get_column_letter(col) for col in range(1, len(styles) + 1)]
+        parts = []
+        for row, values in enumerate(rows, template_row + 1):
+            cells = ''.join(_cell_xml(f'{letter}{row}', styles[letter], value)
+                            for letter, value in zip(letters, values))
+            parts.append(f'<row r="{row}">{cells}</row>')
+        end = xml.rindex(b'</sheetData>')
+        _rewrite_workbook(source, output_file, {sheet_name: xml[:end] + ''.join(parts).encode() + xml[end:]})
+
+_DIMENSION_PATTERN = re.compile(rb'(<dimension ref="[A-Z]+\d+:[A-Z]+)\d+"')
+
+def insert_workbook_rows(source, output, sheet_rows):
+    """把预先生成的行 XML 插入各工作表 sheetData 的末尾，结果写入 output（文件路径或可写的文件对象）
+    
+    sheet_rows 为 {工作表序号: (行 XML, 末行行号)}，末行行号用于更新工作表的 dimension。
+    """
+    import zipfile
+    sheet_rows = {f'xl/worksheets/sheet{sheet + 1}.xml': rows for sheet, rows in sheet_rows.items()}
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info in src.infolist():
+            data = src.read(info.filename)
+            if info.filename in sheet_rows:
+                rows, last_row = sheet_rows[info.filename]
+                end = data.rindex(b'</sheetData>')
+                head = _DIMENSION_PATTERN.sub(lambda match: match.group(1) + b'%d"' % last_row, data[:end], count=1)
+                data = head + rows + data[end:]
+            target.writestr(info, data)
+
+_MERGE_CELLS_PATTERN = re.compile(rb'<mergeCells count="(\d+)">(.*?)</mergeCells>', re.S)
+
+def stream_workbook_rows(source, output, sheet_chunks):
+    """把分批生成的行 XML 写入各工作表 sheetData 的末尾，合并区域接在已有的 mergeCells 之后，结果写入 output
+    
+    sheet_chunks 为 {工作表序号: 依次返回 (行 XML, mergeCell XML, 合并区域数) 的迭代器}，
+    每批写出后即丢弃；合并区域在 sheetData 之后，先写入临时文件，行写完后再接上。
+    """
+    import shutil
+    import tempfile
+    import zipfile
+    sheet_chunks = {f'xl/worksheets/sheet{sheet + 1}.xml': chunks for sheet, chunks in sheet_chunks.items()}
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info in src.infolist():
+            data = src.read(info.filename)
+            if info.filename not in sheet_chunks:
+                target.writestr(info, data)
+                continue
+            end = data.rindex(b'</sheetData>')
+            merged = _MERGE_CELLS_PATTERN.search(data, end)
+            count = int(merged.group(1)) if merged else 0
+            with target.open(info, 'w') as f, tempfile.TemporaryFile() as merges:
+                f.write(data[:end])
+                for row_xml, merge_xml, merge_count in sheet_chunks[info.filename]:
+                    f.write(row_xml)
+                    merges.write(merge_xml)
+                    count += merge_count
+                merges.seek(0)
+                if merged:
+                    f.write(data[end:merged.start()] + b'<mergeCells count="%d">' % count + merged.group(2))
+                    shutil.copyfileobj(merges, f)
+                    f.write(b'</mergeCells>' + data[merged.end():])
+                elif count:
+                    # mergeCells 紧跟在 sheetData 之后
+                    f.write(b'</sheetData><mergeCells count="%d">' % count)
+                    shutil.copyfileobj(merges, f)
+                    f.write(b'</mergeCells>' + data[end + len(b'</sheetData>'):])
+                else:
+                    f.write(data[end:])
+
+def update_incrementally(output_file, roster, employee_matrix, layout, digests, summaries, year, month,
+                         days_in_month, sheet_per_position=False, rules=None, rollup_rows=None):
+    """与上次生成的指纹对比，只改写打卡数据有变化的员工的签到、签退两行
+    
+    有汇总工作表时（rollup_rows）一并改写汇总行。返回改写的员工数；没有可用的指纹、布局变化或累计时长列的合并方式变化时返回 None，
+    此时需要完整重新生成。
+    """
+    import numpy as np
+    fingerprint = load_fingerprint(output_file)
+    if fingerprint is None or fingerprint['layout'] != layout or len(fingerprint['digests']) != len(digests):
+        return None
+    
+    changed = [i for i, (old, new) in enumerate(zip(fingerprint['digests'], digests)) if old != new]
+    # 累计时长列从无到有（或反过来）时合并区域也会变化，交给完整生成处理
+    if any(fingerprint['summaries'][i] != summaries[i] for i in changed):
+        return None
+    if changed:
+        # 只为有变化的员工生成行内容
+        matrix_rows = np.cumsum([has_punch for _, _, has_punch in roster]) - 1
+        changed_roster = [roster[i] for i in changed]
+        changed_matrix = employee_matrix.take([matrix_rows[i] for i in changed if roster[i][2]])
+        employee_rows, _ = build_employee_rows(changed_roster, changed_matrix, year, month, days_in_month,
+                                               rules=rules)
+        
+        sheet_rows = get_employee_sheet_rows(roster, sheet_per_position)
+        sheet_updates = {}
+        for i, (check_in_row, check_out_row, _) in zip(changed, employee_rows):
+            sheet, row = sheet_rows[i]
+            sheet_updates.setdefault(sheet, {})[row] = dict(enumerate(check_in_row, 1))
+            sheet_updates[sheet][row + 1] = dict(enumerate(check_out_row, 1))
+        if rollup_rows:
+            sheet_updates.update(rollup_sheet_updates(rollup_rows, get_rollup_sheet_index(roster, sheet_per_position)))
+        if not patch_workbook_rows(output_file, sheet_updates):
+            return None
+    
+    save_fingerprint(output_file, layout, digests, summaries)
+    return len(changed)
+
+# 按日追加：记录每个员工每天的签到、签退分钟数，追加新的一天时只重算累计值
+def get_append_state_file(output_file):
+    """按日追加的状态文件与输出文件放在一起"""
+    return output_file + '.append.npz'
+
+def save_append_state(output_file, layout, through_day, employee_matrix):
+    """记录表格布局、已填写到哪一天、每天的签到签退分钟数，以及输出文件的大小和修改时间"""
+    import numpy as np
+    stat = os.stat(output_file)
+    with open(get_append_state_file(output_file), 'wb') as f:
+        np.savez(f, layout=np.array(layout), through_day=np.array(through_day),
+                 check_in=employee_matrix.check_in, check_out=employee_matrix.check_out,
+                 output_stat=np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64))
+
+def load_append_state(output_file):
+    """读取按日追加的状态；输出文件不存在或在上次写入后被改动过时返回 None"""
+    import numpy as np
+    state_file = get_append_state_file(output_file)
+    if not os.path.exists(output_file) or not os.path.exists(state_file):
+        return None
+    try:
+        with np.load(state_file) as data:
+            state = {key: data[key] for key in data.files}
+        stat = os.stat(output_file)
+        if state['output_stat'].tolist() != [stat.st_size, stat.st_mtime_ns]:
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    state['layout'] = str(state['layout'])
+    state['through_day'] = int(state['through_day'])
+    return state
+
+def load_appended_through_day(output_file):
+    """上次按日追加已填写到哪一天，没有追加状态时返回 0
+    
+    不检查输出文件是否被改动过：只用于完整生成时决定至少填写到哪一天。
+    """
+    import numpy as np
+    try:
+        with np.load(get_append_state_file(output_file)) as data:
+            return int(data['through_day'])
+    except (OSError, ValueError, KeyError):
+        return 0
+
+def append_day_to_sheet(source_file, output_file, day, year, month, days_in_month, engine=None,
+                        sheet_per_position=False, rules=None, rollup=False):
+    """只读取数据源中这一天的打卡列，改写输出文件中这一天的两列和每个员工的汇总列
+    
+    rollup 为 True 时一并改写汇总工作表。    
+    返回改写的员工数；没有可用的追加状态、布局变化或跳过了中间的日期时返回 None，
+    此时需要完整生成截至这一天（已追加到更晚的日期时截至那一天）的考勤表。
+    """
+    state = load_append_state(output_file)
+    if state is None or day > state['through_day'] + 1:
+        return None
     
-    print(f"所有员工数据处理完成！总共处理了 {total_processed} 条打卡记录")
+    employees, positions, departments, punch_records = read_source_data(source_file, engine, day)
+    source_matrix = PunchMatrix.from_records(punch_records, [day])
+    roster, punch_positions = build_roster(employees, positions, source_matrix)
+    layout = build_layout_signature(roster, year, month, days_in_month, sheet_per_position, rules,
+                                    departments if rollup else None)
+    if layout != state['layout'] or len(punch_positions) != len(state['check_in']):
+        return None
+    
+    # 只解析这一天，再用保存的每天签到签退分钟数整体重算各项统计
+    day_matrix = source_matrix.take(punch_positions)
+    month_matrix = PunchMatrix(day_matrix.names, day_matrix.groups, state['check_in'], state['check_out'])
+    month_matrix.check_in[:, day - 1] = day_matrix.check_in[:, 0]
+    month_matrix.check_out[:, day - 1] = day_matrix.check_out[:, 0]
+    through_day = max(state['through_day'], day)
+    stats = compute_employee_stats(month_matrix, through_day, rules)
+    processed_counts = stats['processed'].tolist()
+    total_hours = stats['total_hours'].round(EXCEL_DECIMALS)
+    worked = day_matrix.worked()[:, 0]
+    check_ins = day_matrix.punch_values(0)[:, 0]
+    check_outs = day_matrix.punch_values(1)[:, 0]
+    day_hours = day_matrix.work_hours()[:, 0].round(EXCEL_DECIMALS)
+    
+    col = build_day_headers(year, month, days_in_month)[2][day]
+    summary_col = 4 + days_in_month * 2
+    sheet_rows = get_employee_sheet_rows(roster, sheet_per_position)
+    sheet_updates = {}
+    missing_rows = {}
+    i = 0  # 已匹配员工在打卡矩阵中的下标
+    for (_, _, has_punch), (sheet, row) in zip(roster, sheet_rows):
+        if not has_punch:
+            continue
+        check_in_cells = {col: check_ins[i], col + 1: day_hours[i] if worked[i] else None}
+        if processed_counts[i] > 0:
+            check_in_cells[summary_col] = total_hours[i]
+            check_in_cells[summary_col + 1] = int(stats['rest_days'][i])
+            if rules is not None:
+                check_in_cells[summary_col + 2] = format_stats_remark(stats, i)
+        sheet_updates.setdefault(sheet, {})[row] = check_in_cells
+        sheet_updates[sheet][row + 1] = {col: check_outs[i]}
+        missing_rows.setdefault(sheet, []).append(row)
+        i += 1
+    # 数据缺失的标记范围延伸到已填写的最后一天
+    missing_sqrefs = {sheet: build_missing_sqref(rows, 4, get_last_punch_col(through_day))
+                      for sheet, rows in missing_rows.items()}
+    if rollup:
+        rollup_rows = build_rollup_rows(roster, departments, month_matrix, year, month, through_day)
+        sheet_updates.update(rollup_sheet_updates(rollup_rows, get_rollup_sheet_index(roster, sheet_per_position)))
+    if sheet_updates and not patch_workbook_rows(output_file, sheet_updates, missing_sqrefs):
+        return None
     
-    # 调整列宽
-    for col in range(1, current_col + 3):
-        if col <= 3:
-            ws.column_dimensions[get_column_letter(col)].width = 12
-        elif col % 2 == 0:  # 工作时长列
-            ws.column_dimensions[get_column_letter(col)].width = 8
-        else:  # 签到签退列
-            ws.column_dimensions[get_column_letter(col)].width = 10
+    save_append_state(output_file, layout, through_day, month_matrix)
+    record_monthly_results(output_file, year, month, roster, departments, month_matrix, through_day)
+    return i
+
+# 月度结果库：每次生成后把每个员工的月度汇总写入输出目录下的 SQLite 文件，供年度汇总使用
+RESULT_STORE_NAME = 'attendance_results.sqlite'
+RESULT_STORE_VERSION = 2  # 表结构或员工识别方式变化时递增
+
+def get_result_store(output_file):
+    """月度结果库与输出文件放在同一目录"""
+    return os.path.join(os.path.dirname(os.path.abspath(output_file)), RESULT_STORE_NAME)
+
+def build_monthly_totals(roster, departments, employee_matrix, days):
+    """每个员工（截至第 days 天）的月度汇总，与 roster 一一对应
+    
+    返回 {列名: 数组}：processed / work_days / rest_days / total_hours，以及对齐后的 departments；
+    没有打卡记录的员工各项为 0，休息天数为 days。
+    """
+    import numpy as np
+    stats = compute_employee_stats(employee_matrix, days)
+    has_punch = np.array([has_punch for _, _, has_punch in roster], dtype=bool)
+    columns = {key: np.zeros(len(roster), dtype=stats[key].dtype) for key in ('processed', 'work_days')}
+    columns['total_hours'] = np.zeros(len(roster))
+    columns['rest_days'] = np.full(len(roster), days)
+    for key, values in columns.items():
+        values[has_punch] = stats[key]
+    columns['departments'] = [str(department) for department in departments[:len(roster)]]
+    columns['departments'] += [''] * (len(roster) - len(columns['departments']))
+    return columns
+
+def get_name_occurrences(roster):
+    """每个员工是同名员工中的第几个（按表内顺序），与 roster 一一对应
+    
+    考勤组每月都可能变化，结果库按 姓名+序号 识别同一个员工。
+    """
+    occurrences = {}
+    result = []
+    for employee_key, _, _ in roster:
+        name = str(employee_key[0])
+        result.append(occurrences.get(name, 0))
+        occurrences[name] = result[-1] + 1
+    return result
+
+def save_monthly_results(store_file, year, month, roster, departments, employee_matrix, days):
+    """用本月（截至第 days 天）的员工汇总替换结果库中该月份的记录"""
+    import sqlite3
+    columns = build_monthly_totals(roster, departments, employee_matrix, days)
+    rows = [
+        (year, month, str(employee_key[0]), employee_key[1], occurrence, department, days,
+         int(processed), int(work_days), int(rest_days), float(total_hours))
+        for (employee_key, _, _), occurrence, department, processed, work_days, rest_days, total_hours in zip(
+            roster, get_name_occurrences(roster), columns['departments'], columns['processed'],
+            columns['work_days'], columns['rest_days'], columns['total_hours'])
+    ]
+    # 自行管理事务：先用 BEGIN IMMEDIATE 取得写锁，再检查版本、建表和写入，
+    # 批量模式下多个进程同时写入新的结果库时，不会有进程在别人写入后再清除表
+    conn = sqlite3.connect(store_file, timeout=30, isolation_level=None)
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        # 旧版本的记录按 姓名+考勤组 区分员工，无法换算，清除后需要重新生成各月份
+        if conn.execute('PRAGMA user_version').fetchone()[0] != RESULT_STORE_VERSION:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'monthly_results'").fetchone():
+                logger.warning("警告：月度结果库格式已更新，旧的月份记录已清除，请重新生成之前月份的考勤表")
+            conn.execute('DROP TABLE IF EXISTS monthly_results')
+            conn.execute(f'PRAGMA user_version = {RESULT_STORE_VERSION}')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS monthly_results ('
+            'year INTEGER, month INTEGER, employee TEXT, position TEXT, occurrence INTEGER, department TEXT, '
+            'days INTEGER, processed INTEGER, work_days INTEGER, rest_days INTEGER, total_hours REAL, '
+            'PRIMARY KEY (year, month, employee, occurrence))')
+        conn.execute('DELETE FROM monthly_results WHERE year = ? AND month = ?', (year, month))
+        conn.executemany('INSERT INTO monthly_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.close()
+
+def record_monthly_results(output_file, year, month, roster, departments, employee_matrix, days):
+    """写入月度结果库；失败时只给出警告，不影响考勤表"""
+    import sqlite3
+    try:
+        save_monthly_results(get_result_store(output_file), year, month, roster, departments, employee_matrix,
+                             days)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"警告：写入月度结果库失败 - {e}")
+
+def load_ytd_results(store_file, year):
+    """从结果库读取某年各月份的员工汇总
+    
+    返回 (月份列表, 员工列表)，员工列表为 [(姓名, 岗位, 部门, {月份: 累计时长}, 工作天数, 休息天数)]，
+    按第一次出现的月份和表内顺序排列。同一员工按 姓名+序号 合并，岗位和部门只用于显示，取最近一个月的。
+    """
+    import sqlite3
+    with sqlite3.connect(store_file) as conn:
+        if conn.execute('PRAGMA user_version').fetchone()[0] != RESULT_STORE_VERSION:
+            logger.warning("警告：月度结果库是旧版本格式，请重新生成各月份的考勤表")
+            rows = []
+        else:
+            rows = conn.execute(
+                'SELECT month, employee, position, occurrence, department, work_days, rest_days, total_hours '
+                'FROM monthly_results WHERE year = ? ORDER BY month, rowid', (year,)).fetchall()
+    conn.close()
+    months = sorted({row[0] for row in rows})
+    employees = {}
+    for month, employee, position, occurrence, department, work_days, rest_days, total_hours in rows:
+        entry = employees.setdefault((employee, occurrence), [employee, '', '', {}, 0, 0])
+        entry[1] = position
+        entry[2] = department
+        entry[3][month] = total_hours
+        entry[4] += work_days
+        entry[5] += rest_days
+    return months, [tuple(entry) for entry in employees.values()]
+
+def create_ytd_report(year, store_file=None, output_file=None):
+    """根据月度结果库生成年度汇总表：每个员工一行，列出各月累计时长和全年合计"""
+    logger.info(f"正在生成 {year} 年度汇总...")
+    store_file = store_file or RESULT_STORE_NAME
+    if not os.path.exists(store_file):
+        logger.error(f"错误：未找到月度结果库 {store_file}，请先生成各月份的考勤表")
+        return None
+    months, employees = load_ytd_results(store_file, year)
+    if not months:
+        logger.error(f"错误：月度结果库中没有 {year} 年的数据")
+        return None
+    logger.info(f"找到 {len(months)} 个月份、{len(employees)} 个员工：{'、'.join(f'{m}月' for m in months)}")
+    
+    headers = ['员工姓名', '岗位', '部门'] + [f'{m}月' for m in months] + ['累计时长', '工作天数', '休息天数']
+    styles = build_sheet_styles()
+    row_styles = ['cell'] * 3 + ['hours'] * (len(months) + 1) + ['cell'] * 2
+    writer = StreamingSheetWriter(styles, len(headers))
+    writer.add_sheet(f'{year}年度汇总')
+    writer.merge(1, 1, len(headers), 1)
+    writer.append([f'{year}年度考勤汇总'], 'title')
+    writer.append([f"月份：{'、'.join(f'{m}月' for m in months)}"], 'info')
+    writer.append(headers, 'header')
+    rows = []
+    for employee, position, department, monthly_hours, work_days, rest_days in employees:
+        hours = [monthly_hours.get(m) for m in months]
+        rows.append([employee, position, department] + hours + [sum(monthly_hours.values()), work_days, rest_days])
+    
+    # 第一个员工行由 openpyxl 写入作为样式模板，其余行直接按模板生成 XML
+    writer.append(rows[0], row_styles)
+    output_file = output_file or f'{year}年度员工考勤汇总表.xlsx'
+    writer.save(output_file)
+    append_workbook_rows(output_file, 0, 4, rows[1:])
+    logger.info(f"年度汇总表已创建: {output_file}")
+    return output_file
+
+# 平面表导出：每个员工每天一行的明细表和每个员工一行的月度汇总表，由 pandas 直接写出，不经过 openpyxl
+EXPORT_FORMATS = ['xlsx', 'csv', 'parquet']
+
+def resolve_export_formats(formats):
+    """去掉重复的输出格式；指定 parquet 但 pyarrow、fastparquet 都未安装时抛出 ValueError"""
+    import importlib.util
+    formats = list(dict.fromkeys(formats or ['xlsx']))
+    if 'parquet' in formats and not any(importlib.util.find_spec(name) for name in ('pyarrow', 'fastparquet')):
+        raise ValueError("parquet 格式需要安装 pyarrow（pip install pyarrow），或改用 --format csv")
+    return formats
+
+def get_export_files(output_file, fmt):
+    """平面表的 (每天明细文件, 月度汇总文件)，与考勤表同名、扩展名为导出格式"""
+    stem = os.path.splitext(output_file)[0]
+    return f'{stem}.{fmt}', f'{stem}_月度汇总.{fmt}'
+
+def build_flat_tables(roster, departments, employee_matrix, year, month, days):
+    """生成平面表：每天明细只包含有打卡记录的员工的前 days 天，月度汇总包含全部员工
+    
+    明细列为 employee / position / date / check_in / check_out / hours，缺失的打卡和没有工作时长的日期为空；
+    工时保留两位小数，与考勤表中显示的一致。
+    """
+    import numpy as np
+    import pandas as pd
+    keys = [employee_key for employee_key, _, has_punch in roster if has_punch]
+    dates = np.datetime64(f'{year:04d}-{month:02d}-01') + np.arange(days)
+    hours = np.where(employee_matrix.worked(), employee_matrix.work_hours(), np.nan)[:, :days].round(2)
+    daily = pd.DataFrame({
+        'employee': np.repeat(np.array([str(key[0]) for key in keys], dtype=object), days),
+        'position': np.repeat(np.array([key[1] for key in keys], dtype=object), days),
+        'date': np.tile(dates, len(keys)),
+        'check_in': employee_matrix.punch_texts(0)[:, :days].ravel(),
+        'check_out': employee_matrix.punch_texts(1)[:, :days].ravel(),
+        'hours': hours.ravel(),
+    })
+    columns = build_monthly_totals(roster, departments, employee_matrix, days)
+    totals = pd.DataFrame({
+        'employee': [str(employee_key[0]) for employee_key, _, _ in roster],
+        'position': [employee_key[1] for employee_key, _, _ in roster],
+        'department': columns['departments'],
+        'total_hours': columns['total_hours'].round(2),
+        'work_days': columns['work_days'],
+        'rest_days': columns['rest_days'],
+    })
+    return daily, totals
+
+def export_flat_tables(output_file, formats, roster, departments, employee_matrix, year, month, days):
+    """按格式写出平面表，返回写出的文件列表；各格式都由同一次 build_flat_tables 的结果写出"""
+    tables = build_flat_tables(roster, departments, employee_matrix, year, month, days)
+    written = []
+    for fmt in formats:
+        for frame, path in zip(tables, get_export_files(output_file, fmt)):
+            if fmt == 'csv':
+                # 带 BOM，Excel 直接打开时中文不乱码
+                frame.to_csv(path, index=False, encoding='utf-8-sig', lineterminator='\n')
+            else:
+                frame.to_parquet(path, index=False)
+            written.append(path)
+    return written
+
+def get_peak_memory_mb():
+    """进程到目前为止的内存峰值（MB），无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块，读取进程的峰值工作集
+        try:
+            import ctypes
+            from ctypes import wintypes
+        except ImportError:
+            return None
+        
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+        
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        try:
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return None
+        except (AttributeError, OSError):
+            return None
+        return counters.PeakWorkingSetSize / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class PhaseProfiler:
+    """--profile：记录每个阶段的墙钟时间、CPU 时间和阶段结束时的内存峰值
+    
+    output_file 以 .json 结尾时输出 Chrome trace（可在 chrome://tracing 或 Perfetto 中打开），
+    否则用 cProfile 记录整个运行过程并保存为 pstats 文件。
+    """
+    
+    def __init__(self, output_file=None):
+        self.output_file = output_file
+        self.phases = []
+        self.start = time.perf_counter()
+        self.cprofile = None
+        if output_file and not output_file.endswith('.json'):
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+    
+    @contextmanager
+    def phase(self, name):
+        """记录 with 块内的一个阶段"""
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.phases.append((name, wall_start - self.start, time.perf_counter() - wall_start,
+                                time.process_time() - cpu_start, get_peak_memory_mb()))
+    
+    def finish(self):
+        """输出各阶段汇总表，并按需保存 pstats 或 Chrome trace 文件"""
+        # 汇总表是 --profile 要求的报告而不是日志，直接写到标准输出，--quiet 时也能看到
+        total_wall = time.perf_counter() - self.start
+        lines = ["\n各阶段耗时：", f"  {'墙钟时间':>8} {'CPU时间':>9} {'内存峰值':>8}  阶段"]
+        for name, _, wall, cpu, peak in self.phases:
+            peak_text = f"{peak:.0f}MB" if peak is not None else '-'
+            lines.append(f"  {wall:>11.3f}s {cpu:>10.3f}s {peak_text:>11}  {name}")
+        other = total_wall - sum(phase[2] for phase in self.phases)
+        lines.append(f"  {other:>11.3f}s {'':>11} {'':>11}  其他")
+        lines.append(f"  {total_wall:>11.3f}s {'':>11} {'':>11}  合计")
+        print('\n'.join(lines), flush=True)
+        
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.output_file)
+            logger.info(f"cProfile 统计已保存：{self.output_file}（可用 python -m pstats 查看）")
+        elif self.output_file:
+            events = [
+                {'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0, 'ts': round(offset * 1e6),
+                 'dur': round(wall * 1e6), 'args': {'cpu_ms': round(cpu * 1000, 3), 'peak_memory_mb': peak}}
+                for name, offset, wall, cpu, peak in self.phases
+            ]
+            with open(self.output_file, 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+            logger.info(f"Chrome trace 已保存：{self.output_file}（可在 chrome://tracing 或 Perfetto 中打开）")
+
+class _NullProfiler:
+    """未指定 --profile 时使用，每个阶段只多一次空的 with"""
+    
+    _context = nullcontext()
+    
+    def phase(self, name):
+        return self._context
+
+NULL_PROFILER = _NullProfiler()
+
+def render_workbook(output, roster, departments, employee_matrix, year, month, days_in_month, streaming=False,
+                    jobs=None, sheet_per_position=False, rules=None, rollup=False, through_day=None,
+                    profiler=None):
+    """由员工布局和打卡矩阵生成考勤表并保存到 output（文件路径或可写的文件对象）
+    
+    through_day 为进行中月份已填写到的日期（默认整月）。返回处理的打卡记录数。
+    """
+    profiler = profiler or NULL_PROFILER
+    # 创建工作簿（流式模式使用 write_only 工作表，按行顺序输出）
+    with profiler.phase('创建表头'):
+        summary_col = 4 + days_in_month * 2  # 累计时长列
+        last_col = summary_col + 2  # 备注列
+        styles = build_sheet_styles()
+        row_styles = get_employee_row_styles(days_in_month)
+        writer = StreamingSheetWriter(styles, last_col) if streaming else SheetWriter(styles, last_col)
+        
+        # 创建表头
+        logger.info("正在创建表头...")
+        weekday_row, date_row, _, _ = build_day_headers(year, month, days_in_month)
+    
+    # 每天的明细只在需要输出时才收集和格式化
+    log_days = day_logger.isEnabledFor(logging.DEBUG)
+    # 并行时各进程直接生成员工行的 XML（行号按最终布局预先分配），主进程只写表头、登记合并区域，
+    # 保存后再把员工行按顺序插入各工作表。
+    # 流式模式（单进程）同样先只写表头，保存时再分批生成员工行，边生成边写入，不保留所有员工的行
+    parallel = bool(jobs and jobs > 1 and len(roster) > 1)
+    chunked = streaming and not parallel
+    sheet_rows = get_employee_sheet_rows(roster, sheet_per_position)
+    if chunked or parallel:
+        style_ids = [writer.style_id(key) for key in row_styles]
+        row_style_id = writer.style_id(MERGED_ROW_STYLE)
+    with profiler.phase('填充数据'):
+        if chunked:
+            employee_rows = None
+            total_processed = int(compute_employee_stats(employee_matrix, through_day or days_in_month)[
+                'processed'].sum())
+        elif parallel:
+            row_xml, merge_cols, summaries = build_employee_rows_parallel(
+                roster, employee_matrix, [row for _, row in sheet_rows], style_ids, row_style_id,
+                year, month, days_in_month, jobs, log_days, through_day, rules)
+            employee_rows = [(None, None, cols) for cols in merge_cols]
+        else:
+            employee_rows, summaries = build_employee_rows(roster, employee_matrix, year, month, days_in_month,
+                                                           log_days, through_day, rules)
+        if not chunked:
+            log_employee_summaries(summaries, year, month)
+            total_processed = sum(summary[2] for summary in summaries)
+    
+    # 按顺序写入工作表；按岗位分表时每个岗位（考勤组）一个工作表，划分方式见 get_employee_sheet_rows
+    # 有打卡记录的员工标记数据缺失，范围为已填写的日期
+    missing_cols = (4, get_last_punch_col(through_day or days_in_month))
+    used_titles = set()
+    pending_rows = {}
+    with profiler.phase('写入行和样式'):
+        groups = {}
+        for i, (employee_key, _, _) in enumerate(roster):
+            groups.setdefault(employee_key[1] if sheet_per_position else None, []).append(i)
+        for position_key, indexes in groups.items():
+            writer.add_sheet(get_sheet_title(position_key, used_titles) if sheet_per_position else None)
+            write_sheet_header(writer, year, month, days_in_month, weekday_row, date_row)
+            for i in indexes:
+                employee_missing_cols = missing_cols if roster[i][2] else None
+                if chunked:
+                    # 合并区域在写入行时直接写出
+                    writer.reserve_pair((), employee_missing_cols)
+                    continue
+                check_in_row, check_out_row, merge_cols = employee_rows[i]
+                if parallel:
+                    writer.reserve_pair(merge_cols, employee_missing_cols)
+                    pending_rows.setdefault(sheet_rows[i][0], []).append(row_xml[i])
+                else:
+                    writer.append_pair(check_in_row, check_out_row, row_styles, merge_cols,
+                                       employee_missing_cols)
+    with profiler.phase('合并单元格'):
+        writer._finish_sheet()
+    
+    # 汇总工作表：在同一个打卡矩阵上按岗位、部门分组统计
+    if rollup:
+        with profiler.phase('汇总工作表'):
+            writer.add_sheet(get_sheet_title(ROLLUP_SHEET_TITLE, used_titles))
+            writer.merge(1, 1, len(ROLLUP_HEADERS) + 1, 1)
+            for values, style in build_rollup_rows(roster, departments, employee_matrix, year, month,
+                                                   through_day or days_in_month):
+                writer.append(values, style)
     
     # 保存文件
+    if chunked:
+        with profiler.phase('保存文件'):
+            buffer = io.BytesIO()
+            writer.save(buffer)
+        with profiler.phase('流式写入'):
+            # 每个工作表的员工只取出一次打卡矩阵，再按批生成
+            matrix_rows = list(itertools.accumulate(has_punch for _, _, has_punch in roster))
+            sheet_chunks = {}
+            for sheet, indexes in enumerate(groups.values()):
+                sheet_matrix = employee_matrix.take([matrix_rows[i] - 1 for i in indexes if roster[i][2]])
+                sheet_chunks[sheet] = iter_employee_xml_chunks(
+                    [roster[i] for i in indexes], sheet_matrix, [sheet_rows[i][1] for i in indexes], style_ids,
+                    row_style_id, year, month, days_in_month, log_days, through_day, rules)
+            stream_workbook_rows(buffer, output, sheet_chunks)
+        return total_processed
+    
+    with profiler.phase('保存文件'):
+        if pending_rows:
+            buffer = io.BytesIO()
+            writer.save(buffer)
+            last_rows = {sheet: row + 1 for sheet, row in sheet_rows}
+            insert_workbook_rows(buffer, output, {sheet: (''.join(rows).encode(), last_rows[sheet])
+                                                  for sheet, rows in pending_rows.items()})
+        else:
+            writer.save(output)
+    return total_processed
+
+def create_new_attendance_sheet(source_file=None, output_file=None, year=None, month=None, streaming=False,
+                                engine=None, use_cache=True, jobs=None, sheet_per_position=False,
+                                incremental=False, append_day=None, rules=None, rollup=False, profiler=None,
+                                formats=None):
+    """创建新的考勤统计表
+    
+    incremental 为 True 时，如果上次生成的输出文件和指纹仍然可用，只改写打卡数据有变化的员工。
+    append_day 为进行中月份的按日追加：只填写这一天的两列并更新汇总列；
+    还没有可用的追加状态时，完整生成截至这一天的考勤表。
+    rules（ShiftRules）为迟到、早退、加班的判定规则，指定时在备注列填写统计。
+    rollup 为 True 时在最后增加按岗位、部门分组的汇总工作表。
+    profiler（PhaseProfiler）记录各阶段的耗时和内存峰值。
+    formats 为输出格式列表（默认只有 xlsx）；csv、parquet 为每天明细和月度汇总两张平面表，
+    与考勤表同名，只有 csv / parquet 时不创建考勤表。增量更新和按日追加只适用于考勤表。
+    """
+    profiler = profiler or NULL_PROFILER
+    try:
+        formats = resolve_export_formats(formats)
+    except ValueError as e:
+        logger.error(f"错误：{e}")
+        return None
+    write_xlsx = 'xlsx' in formats
+    logger.info("正在创建新的考勤统计表...")
+    
+    # 查找数据源文件
+    if not source_file:
+        source_file = find_source_file()
+    
+    if not source_file:
+        logger.error("错误：未找到数据源文件！")
+        logger.error("请确保当前目录下有符合格式的文件：考勤表-上下班工时统计表YYYY年M月.xlsx")
+        return None
+    
+    logger.info(f"找到数据源文件：{source_file}")
+    
+    # 解析年月信息
+    if not year or not month:
+        parsed_year, parsed_month = parse_date_from_filename(source_file)
+        if not parsed_year or not parsed_month:
+            logger.error("错误：无法从文件名解析年月信息！")
+            return None
+        year, month = parsed_year, parsed_month
+    
+    logger.info(f"解析得到：{year}年{month}月")
+    
+    days_in_month = get_days_in_month(year, month)
     if not output_file:
         output_file = f'{year}年{month}月员工考勤统计表.xlsx'
     
-    wb.save(output_file)
-    print(f"新考勤统计表已创建: {output_file}")
-    print(f"包含 {len(employees)} 个员工，{days_in_month} 天的完整结构")
-    print("每天两列：签到签退列 + 工作时长列")
-    print("员工姓名和岗位列已合并为两行单元格")
-    print("所有员工的打卡数据已导入完成")
+    # 按日追加：已有追加状态时只改写这一天
+    if append_day is not None and write_xlsx:
+        if not 1 <= append_day <= days_in_month:
+            logger.error(f"错误：{year}年{month}月没有第 {append_day} 天！")
+            return None
+        try:
+            with profiler.phase('按日追加'):
+                appended = append_day_to_sheet(source_file, output_file, append_day, year, month, days_in_month,
+                                               engine, sheet_per_position, rules, rollup)
+        except Exception as e:
+            logger.error(f"错误：读取Excel文件失败 - {e}")
+            return None
+        if appended is not None:
+            logger.info(f"按日追加：已填写 {appended} 个员工 {month}月{append_day}日 的打卡数据，"
+                        f"并更新累计时长和休息天数：{output_file}")
+            return output_file
+        # 之前已追加到更晚的日期时（如名单变化后重新追加前面的某一天），完整生成到那一天，不丢掉已填写的日期
+        append_day = min(max(append_day, load_appended_through_day(output_file)), days_in_month)
+        logger.info(f"没有可用的追加记录或表格布局已变化，完整生成截至 {month}月{append_day}日 的考勤表")
+    
+    # 读取原始数据获取员工信息
+    try:
+        with profiler.phase('读取数据'):
+            employees, positions, departments, punch_matrix = read_source_data_cached(source_file, engine,
+                                                                                      use_cache)
+    except Exception as e:
+        logger.error(f"错误：读取Excel文件失败 - {e}")
+        return None
+    
+    logger.info(f"找到 {len(employees)} 个员工")
+    logger.debug(f"员工列表: {employees}")
+    logger.debug(f"岗位信息: {positions}")
+    
+    # 计算指定年月的天数
+    logger.info(f"{year}年{month}月共有{days_in_month}天")
+    
+    # 创建员工数据行
+    logger.info("正在创建员工数据行...")
+    
+    with profiler.phase('员工布局'):
+        roster, punch_positions = build_roster(employees, positions, punch_matrix)
+        
+        # 填充所有员工的数据
+        logger.info("正在填充所有员工的打卡数据...")
+        employee_matrix = punch_matrix.take(punch_positions, days_in_month)
+    
+    # 平面表直接由打卡矩阵生成
+    flat_formats = [fmt for fmt in formats if fmt != 'xlsx']
+    if flat_formats:
+        with profiler.phase('导出平面表'):
+            exported = export_flat_tables(output_file, flat_formats, roster, departments, employee_matrix,
+                                          year, month, append_day or days_in_month)
+        for path in exported:
+            logger.info(f"已导出：{path}")
+    if not write_xlsx:
+        with profiler.phase('写入结果库'):
+            record_monthly_results(output_file, year, month, roster, departments, employee_matrix,
+                                   append_day or days_in_month)
+        return exported[0]
+    
+    # 增量模式：与上次生成的指纹对比，只改写有变化的员工
+    if incremental:
+        layout = build_layout_signature(roster, year, month, days_in_month, sheet_per_position, rules,
+                                        departments if rollup else None)
+        digests, summary_flags = build_employee_digests(roster, employee_matrix)
+        rollup_rows = (build_rollup_rows(roster, departments, employee_matrix, year, month, days_in_month)
+                       if rollup else None)
+        with profiler.phase('增量更新'):
+            changed = update_incrementally(output_file, roster, employee_matrix, layout, digests, summary_flags,
+                                           year, month, days_in_month, sheet_per_position, rules, rollup_rows)
+        if changed is not None:
+            record_monthly_results(output_file, year, month, roster, departments, employee_matrix, days_in_month)
+            if changed:
+                logger.info(f"增量更新：{changed} 个员工的打卡数据有变化，已改写 {output_file}")
+            else:
+                logger.info(f"增量更新：打卡数据没有变化，{output_file} 保持不变")
+            return output_file
+        logger.info("没有可用的上次生成记录或表格布局已变化，完整生成考勤表")
+    
+    total_processed = render_workbook(output_file, roster, departments, employee_matrix, year, month,
+                                      days_in_month, streaming, jobs, sheet_per_position, rules, rollup,
+                                      append_day, profiler)
+    logger.info(f"所有员工数据处理完成！总共处理了 {total_processed} 条打卡记录")
+    
+    if incremental:
+        save_fingerprint(output_file, layout, digests, summary_flags)
+    if append_day:
+        layout = build_layout_signature(roster, year, month, days_in_month, sheet_per_position, rules,
+                                        departments if rollup else None)
+        save_append_state(output_file, layout, append_day, employee_matrix)
+    with profiler.phase('写入结果库'):
+        record_monthly_results(output_file, year, month, roster, departments, employee_matrix,
+                               append_day or days_in_month)
+    logger.info(f"新考勤统计表已创建: {output_file}")
+    logger.info(f"包含 {len(employees)} 个员工，{days_in_month} 天的完整结构")
+    logger.info("每天两列：签到签退列 + 工作时长列")
+    logger.info("员工姓名和岗位列已合并为两行单元格")
+    logger.info("所有员工的打卡数据已导入完成")
     
     return output_file
 
+def _open_source(source):
+    """把数据源统一为可以交给读取函数的对象，返回 (数据源, 文件名)
+    
+    source 可以是文件路径、二进制文件对象或 bytes；文件对象和 bytes 先读入内存，
+    文件名取自路径或文件对象的 name 属性，没有时为 None。
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(bytes(source)), None
+    if hasattr(source, 'read'):
+        name = getattr(source, 'name', None)
+        return io.BytesIO(source.read()), os.path.basename(name) if isinstance(name, str) else None
+    source = os.fspath(source)
+    return source, os.path.basename(source)
+
+class AttendanceResult:
+    """process_attendance 的结果，全部数据都在内存中
+    
+    employees 为 (姓名, 岗位, 部门) 列表，与 hours 的各行、totals 的各列一一对应；
+    hours 为 员工数 × 当月天数 的每天工作时长（小时），没有打卡数据或没有工作时长的日期为 NaN；
+    totals 为月度汇总 {列名: 数组}：processed / work_days / rest_days / total_hours。
+    """
+    __slots__ = ('year', 'month', 'days_in_month', 'roster', 'departments', 'employee_matrix', 'rules',
+                 'employees', 'hours', 'totals')
+    
+    def __init__(self, year, month, roster, departments, employee_matrix, rules=None):
+        import numpy as np
+        self.year = year
+        self.month = month
+        self.days_in_month = get_days_in_month(year, month)
+        self.roster = roster
+        self.departments = departments
+        self.employee_matrix = employee_matrix
+        self.rules = rules
+        
+        self.totals = build_monthly_totals(roster, departments, employee_matrix, self.days_in_month)
+        departments = self.totals.pop('departments')
+        self.employees = [(employee_key[0], position, department)
+                          for (employee_key, position, _), department in zip(roster, departments)]
+        has_punch = np.array([has_punch for _, _, has_punch in roster], dtype=bool)
+        self.hours = np.full((len(roster), self.days_in_month), np.nan)
+        self.hours[has_punch] = np.where(employee_matrix.worked(), employee_matrix.work_hours(), np.nan)
+    
+    def to_frames(self):
+        """返回 (每天明细, 月度汇总) 两个 DataFrame，列与 --format csv 导出的平面表相同"""
+        return build_flat_tables(self.roster, self.departments, self.employee_matrix, self.year, self.month,
+                                 self.days_in_month)
+    
+    def to_xlsx(self, output=None, streaming=False, sheet_per_position=False, rollup=False, jobs=None):
+        """生成与命令行相同的考勤表，写入 output（默认新建 io.BytesIO）并返回它
+        
+        不读写工作目录，文件对象写完后回到开头，可以直接 getvalue() 或作为响应体返回。
+        """
+        output = io.BytesIO() if output is None else output
+        render_workbook(output, self.roster, self.departments, self.employee_matrix, self.year, self.month,
+                        self.days_in_month, streaming, jobs, sheet_per_position, self.rules, rollup)
+        if hasattr(output, 'seek'):
+            output.seek(0)
+        return output
+
+def process_attendance(source, year=None, month=None, engine=None, rules=None):
+    """在当前进程内处理一个数据源，返回 AttendanceResult
+    
+    source 可以是文件路径、二进制文件对象或 bytes。年月未指定时从文件名解析，
+    无法解析时抛出 ValueError。不查找数据源、不使用解析缓存，也不写入结果库。
+    """
+    source, filename = _open_source(source)
+    if not year or not month:
+        year, month = parse_date_from_filename(filename) if filename else (None, None)
+        if not year or not month:
+            raise ValueError('无法从文件名解析年月信息，请指定 year 和 month')
+    days_in_month = get_days_in_month(year, month)
+    employees, positions, departments, punch_records = read_source_data(source, engine)
+    punch_matrix = PunchMatrix.from_records(punch_records)
+    roster, punch_positions = build_roster(employees, positions, punch_matrix)
+    return AttendanceResult(year, month, roster, departments, punch_matrix.take(punch_positions, days_in_month),
+                            rules)
+
+def get_batch_output_file(source_file):
+    """批量模式的输出文件名，保留数据源文件名中年月之后的部分（如站点名）以免重名"""
+    name = os.path.basename(source_file)
+    match = re.match(r'考勤表-上下班工时统计表(\d{4})年(\d{1,2})月(.*)\.xlsx', name)
+    year, month, suffix = int(match.group(1)), int(match.group(2)), match.group(3)
+    return f'{year}年{month}月员工考勤统计表{suffix}.xlsx'
+
+def _generate_report(source_file, streaming=False, engine=None, use_cache=True, sheet_per_position=False,
+                     incremental=False, rules=None, rollup=False, formats=None):
+    """批量模式的子进程任务：生成单个月份的考勤表，返回 (输出文件, 警告和错误日志)"""
+    year, month = parse_date_from_filename(os.path.basename(source_file))
+    # 子进程只收集警告和错误，由主进程汇总输出
+    log = io.StringIO()
+    configure_logging(logging.WARNING, stream=log)
+    output_file = create_new_attendance_sheet(
+        source_file=source_file,
+        output_file=get_batch_output_file(source_file),
+        year=year,
+        month=month,
+        streaming=streaming,
+        engine=engine,
+        use_cache=use_cache,
+        sheet_per_position=sheet_per_position,
+        incremental=incremental,
+        rules=rules,
+        rollup=rollup,
+        formats=formats
+    )
+    return output_file, log.getvalue()
+
+def run_batch(source_files, jobs=None, streaming=False, engine=None, use_cache=True, sheet_per_position=False,
+              incremental=False, rules=None, rollup=False, formats=None):
+    """使用进程池并行生成多个月份的考勤表，打印每个文件的处理结果，返回失败数"""
+    logger.info(f"批量模式：共 {len(source_files)} 个数据源文件，并行进程数 {jobs or os.cpu_count()}")
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(_generate_report, source_file, streaming, engine, use_cache,
+                            sheet_per_position, incremental, rules, rollup, formats): source_file
+            for source_file in source_files
+        }
+        for future in as_completed(futures):
+            source_file = futures[future]
+            try:
+                output_file, log = future.result()
+            except Exception as e:
+                results[source_file] = (None, f"{type(e).__name__}: {e}")
+                continue
+            if output_file:
+                results[source_file] = (output_file, None)
+            else:
+                # 失败时取日志最后一行作为原因
+                lines = [line for line in log.splitlines() if line.strip()]
+                results[source_file] = (None, lines[-1] if lines else '未知错误')
+    
+    logger.info("\n" + "="*50)
+    logger.info("批量处理结果：")
+    failed = 0
+    for source_file in source_files:
+        output_file, error = results[source_file]
+        if output_file:
+            logger.info(f"✅ {source_file} -> {output_file}")
+        else:
+            failed += 1
+            logger.error(f"❌ {source_file}: {error}")
+    logger.info(f"成功 {len(source_files) - failed} 个，失败 {failed} 个，耗时 {time.perf_counter() - start:.1f} 秒")
+    return failed
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(
@@ -418,9 +2443,29 @@ def main():
 使用示例:
   python create_new_attendance_sheet.py                    # 自动查找数据源文件
   python create_new_attendance_sheet.py --test             # 运行测试
+  python create_new_attendance_sheet.py --self-check       # 先运行时间计算自检再生成考勤表
   python create_new_attendance_sheet.py --input "data.xlsx" # 指定数据源文件
   python create_new_attendance_sheet.py --output "result.xlsx" # 指定输出文件
   python create_new_attendance_sheet.py --year 2025 --month 6 # 指定年月
+  python create_new_attendance_sheet.py --streaming        # 流式写入（超大员工数）
+  python create_new_attendance_sheet.py --engine calamine  # 使用 calamine 引擎读取（需安装 python-calamine）
+  python create_new_attendance_sheet.py --engine readonly  # 不经过 pandas，用 openpyxl 只读模式逐行读取
+  python create_new_attendance_sheet.py --no-cache         # 不使用解析缓存
+  python create_new_attendance_sheet.py --batch --jobs 4   # 批量生成所有月份
+  python create_new_attendance_sheet.py --jobs 4           # 单个月份按员工分片并行生成
+  python create_new_attendance_sheet.py --sheet-per-position # 每个岗位一个工作表
+  python create_new_attendance_sheet.py --incremental      # 只改写打卡数据有变化的员工
+  python create_new_attendance_sheet.py --append-day 15    # 进行中的月份：只追加15日的打卡数据
+  python create_new_attendance_sheet.py --shift-start 09:00 --shift-end 18:00 # 备注列统计迟到、早退、加班和缺卡
+  python create_new_attendance_sheet.py --rollup           # 增加按岗位、部门分组的汇总工作表
+  python create_new_attendance_sheet.py --ytd 2025         # 根据已生成月份的结果库生成年度汇总表
+  python create_new_attendance_sheet.py --format csv       # 只导出每天明细和月度汇总的 CSV 平面表
+  python create_new_attendance_sheet.py --format xlsx parquet # 同时输出考勤表和 Parquet 平面表
+  python create_new_attendance_sheet.py --quiet            # 只输出警告和错误
+  python create_new_attendance_sheet.py --verbose          # 输出每个员工每天的打卡明细
+  python create_new_attendance_sheet.py --log-json days.jsonl # 每天的打卡明细写入JSON Lines文件
+  python create_new_attendance_sheet.py --profile          # 输出各阶段的耗时和内存峰值
+  python create_new_attendance_sheet.py --profile-output run.prof # 同时保存 cProfile 统计（.json 为 Chrome trace）
         """
     )
     
@@ -434,9 +2479,65 @@ def main():
                        help='指定月份（可选）')
     parser.add_argument('--test', '-t', action='store_true',
                        help='运行测试用例')
+    parser.add_argument('--self-check', action='store_true',
+                       help='生成考勤表前先运行时间计算自检')
+    parser.add_argument('--streaming', action='store_true',
+                       help='流式写入模式，适用于超大员工数：员工行分批生成并直接写入文件，'
+                            '不在内存中保留整张表，内存峰值主要来自读取数据源')
+    parser.add_argument('--engine', choices=['openpyxl', 'calamine', 'readonly'], default='openpyxl',
+                       help='Excel读取引擎（默认openpyxl，calamine需安装python-calamine，'
+                            'readonly为不经过pandas的openpyxl只读模式）')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不读取也不写入解析缓存（默认缓存到 .attendance_cache 目录）')
+    parser.add_argument('--batch', action='store_true',
+                       help='批量模式：处理所有符合格式的数据源文件（--input 可指定通配符）')
+    parser.add_argument('--jobs', '-j', type=int,
+                       help='并行进程数：批量模式下默认为CPU核数；单个月份时按员工分片并行生成工作表 XML（默认不分片）')
+    parser.add_argument('--sheet-per-position', action='store_true',
+                       help='按岗位（考勤组）分别输出到不同工作表；不按部门分表，'
+                            '部门只在月度汇总中有、未加入考勤组的员工为空，按部门的统计见 --rollup')
+    parser.add_argument('--incremental', action='store_true',
+                       help='增量更新：只改写与上次生成相比打卡数据有变化的员工')
+    parser.add_argument('--append-day', type=int, metavar='DAY',
+                       help='按日追加：只填写这一天的两列并更新累计时长和休息天数（进行中的月份）')
+    parser.add_argument('--shift-start', metavar='HH:MM',
+                       help='上班时间，签到晚于此时间算迟到，下班时间之后签到的夜班不算（指定任一统计参数时在备注列填写统计，'
+                            '默认09:00）')
+    parser.add_argument('--shift-end', metavar='HH:MM',
+                       help='下班时间，签退早于此时间算早退（默认18:00）')
+    parser.add_argument('--overtime-after', type=float, metavar='HOURS',
+                       help='每天工作超过多少小时算加班（默认为上班到下班的时长）')
+    parser.add_argument('--rollup', action='store_true',
+                       help='增加汇总工作表：按岗位、部门统计人数、累计时长、平均每天工时和数据缺失率')
+    parser.add_argument('--ytd', type=int, metavar='YEAR',
+                       help=f'年度汇总：从月度结果库（默认当前目录的 {RESULT_STORE_NAME}，--input 可指定）'
+                            '汇总各月份每个员工的工时')
+    parser.add_argument('--format', nargs='+', choices=EXPORT_FORMATS, default=['xlsx'], dest='formats',
+                       metavar='FORMAT',
+                       help='输出格式，可指定多个：xlsx（考勤表，默认）、csv、parquet（每个员工每天一行的明细表和'
+                            '月度汇总表，不经过 openpyxl；parquet 需安装 pyarrow，未安装时报错退出）')
+    log_group = parser.add_mutually_exclusive_group()
+    log_group.add_argument('--quiet', '-q', action='store_true',
+                       help='只输出警告和错误')
+    log_group.add_argument('--verbose', '-v', action='store_true',
+                       help='输出每个员工每天的打卡明细')
+    parser.add_argument('--log-json',
+                       help='把每个员工每天的打卡明细写入 JSON Lines 文件')
+    parser.add_argument('--profile', action='store_true',
+                       help='结束时输出读取、表头、填充、写入、合并、保存等各阶段的耗时、CPU时间和内存峰值')
+    parser.add_argument('--profile-output', metavar='FILE',
+                       help='保存性能分析结果：.json 为 Chrome trace，其他为 cProfile 的 pstats 文件（隐含 --profile）')
     
     args = parser.parse_args()
     
+    if args.quiet:
+        log_level = logging.WARNING
+    elif args.verbose:
+        log_level = logging.DEBUG
+    else:
+        log_level = logging.INFO
+    configure_logging(log_level, None if args.batch else args.log_json)
+    
     # 如果只是运行测试
     if args.test:
         test_time_calculation()
@@ -444,30 +2545,100 @@ def main():
     
     # 验证参数
     if args.month and (args.month < 1 or args.month > 12):
-        print("错误：月份必须在1-12之间")
+        logger.error("错误：月份必须在1-12之间")
         return
     
     if args.year and (args.year < 1900 or args.year > 2100):
-        print("错误：年份必须在1900-2100之间")
+        logger.error("错误：年份必须在1900-2100之间")
+        return
+    
+    if args.jobs is not None and args.jobs < 1:
+        logger.error("错误：并行进程数必须大于0")
+        return
+    
+    if args.append_day is not None and (args.batch or args.incremental):
+        logger.error("错误：--append-day 不能与 --batch 或 --incremental 同时使用")
         return
     
-    # 先运行测试
-    test_time_calculation()
-    print("\n" + "="*50 + "\n")
+    try:
+        formats = resolve_export_formats(args.formats)
+    except ValueError as e:
+        logger.error(f"错误：{e}")
+        sys.exit(1)
+    if (args.append_day is not None or args.incremental) and formats != ['xlsx']:
+        logger.error("错误：--append-day 和 --incremental 只适用于 xlsx 格式")
+        return
+    
+    rules = None
+    if args.shift_start or args.shift_end or args.overtime_after is not None:
+        try:
+            rules = ShiftRules(parse_clock(args.shift_start or '09:00'), parse_clock(args.shift_end or '18:00'),
+                               args.overtime_after)
+        except ValueError as e:
+            logger.error(f"错误：{e}")
+            return
+    
+    # 年度汇总：只读取月度结果库，不重新解析任何 Excel 文件
+    if args.ytd:
+        result = create_ytd_report(args.ytd, args.input, args.output)
+        if result:
+            logger.info(f"\n✅ 处理完成！输出文件：{result}")
+        else:
+            logger.error("\n❌ 处理失败！")
+            sys.exit(1)
+        return
+    
+    # 批量模式：每个数据源文件生成一份考勤表
+    if args.batch:
+        if args.log_json:
+            logger.warning("警告：批量模式不支持 --log-json，已忽略")
+        if args.profile or args.profile_output:
+            logger.warning("警告：批量模式不支持 --profile，已忽略")
+        source_files = find_source_files(args.input)
+        if not source_files:
+            logger.error("错误：未找到数据源文件！")
+            logger.error("请确保当前目录下有符合格式的文件：考勤表-上下班工时统计表YYYY年M月.xlsx")
+            sys.exit(1)
+        failed = run_batch(source_files, args.jobs, args.streaming, args.engine, not args.no_cache,
+                           args.sheet_per_position, args.incremental, rules, args.rollup, formats)
+        if failed:
+            sys.exit(1)
+        return
+    
+    # 需要时先运行时间计算自检
+    if args.self_check:
+        test_time_calculation()
+        logger.info("\n" + "="*50 + "\n")
     
     # 创建考勤表
+    profiler = PhaseProfiler(args.profile_output) if args.profile or args.profile_output else None
     result = create_new_attendance_sheet(
         source_file=args.input,
         output_file=args.output,
         year=args.year,
-        month=args.month
+        month=args.month,
+        streaming=args.streaming,
+        engine=args.engine,
+        use_cache=not args.no_cache,
+        jobs=args.jobs,
+        sheet_per_position=args.sheet_per_position,
+        incremental=args.incremental,
+        append_day=args.append_day,
+        rules=rules,
+        rollup=args.rollup,
+        profiler=profiler,
+        formats=formats
     )
+    if profiler:
+        profiler.finish()
     
     if result:
-        print(f"\n✅ 处理完成！输出文件：{result}")
+        logger.info(f"\n✅ 处理完成！输出文件：{result}")
     else:
-        print("\n❌ 处理失败！")
+        logger.error("\n❌ 处理失败！")
         sys.exit(1)
 
 if __name__ == "__main__":
+    # 打包成exe后在Windows上使用进程池需要
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
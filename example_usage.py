@@ -29,6 +29,24 @@ def run_command(cmd, description):
         print(f"Execution failed: {e}")
         return False
 
+def run_library_example(source_file):
+    """在当前进程中调用库接口，结果和考勤表都保留在内存中"""
+    print(f"\n{'='*50}")
+    print("Executing: 库接口 - 在内存中处理数据源")
+    print('='*50)
+    
+    import create_new_attendance_sheet as attendance
+    
+    with open(source_file, 'rb') as f:
+        result = attendance.process_attendance(f)
+    print(f"{result.year}年{result.month}月：{len(result.employees)} 个员工")
+    for (name, position, _), total_hours in list(zip(result.employees, result.totals['total_hours']))[:3]:
+        print(f"  {name}（{position}）累计 {total_hours:.2f} 小时")
+    
+    buffer = result.to_xlsx()
+    print(f"考勤表大小：{len(buffer.getvalue())} 字节（未写入磁盘）")
+    return True
+
 def main():
     """主函数 - 演示各种使用方法"""
     print("考勤统计表生成工具 - 使用示例")
@@ -60,6 +78,9 @@ def main():
         run_command(f"python create_new_attendance_sheet.py --output '示例输出.xlsx'", 
                     "指定输出文件名")
         
+        # 示例6: 作为库调用，不启动子进程
+        run_library_example(data_files[0])
+        
     else:
         print("\n未找到数据源文件，跳过实际处理示例")
         print("请确保当前目录下有符合格式的数据源文件：")
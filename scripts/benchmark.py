@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+性能基准测试脚本
+
+用于对比考勤统计表生成工具各项优化前后的耗时
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# 允许从 scripts 目录直接导入主程序和合成数据生成脚本
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_styles(rows, cols):
+    """对比逐个单元格设置 Font/Border/Alignment 与使用命名样式的耗时"""
+    from openpyxl import Workbook
+    from create_new_attendance_sheet import build_sheet_styles, SheetWriter
+
+    styles = build_sheet_styles()
+
+    # 优化前：每个单元格分别设置字体、边框、对齐
+    cell_style = styles['cell']
+    wb = Workbook()
+    ws = wb.active
+    start = time.perf_counter()
+    for row in range(1, rows + 1):
+        for col in range(1, cols + 1):
+            cell = ws.cell(row=row, column=col)
+            cell.font = cell_style.font
+            cell.border = cell_style.border
+            cell.alignment = cell_style.alignment
+    per_cell = time.perf_counter() - start
+
+    # 优化后：注册一次命名样式，单元格只设置样式名
+    writer = SheetWriter(styles, cols)
+    writer.add_sheet()
+    start = time.perf_counter()
+    for _ in range(rows):
+        writer.append([None] * cols, 'cell')
+    named = time.perf_counter() - start
+
+    print(f"样式设置基准：{rows} 行 × {cols} 列")
+    print(f"  逐单元格设置 Font/Border/Alignment: {per_cell:.3f} 秒")
+    print(f"  命名样式 NamedStyle:               {named:.3f} 秒")
+    print(f"  加速比: {per_cell / named:.1f}x")
+
+
+def bench_startup(targets, runs):
+    """对比 --help 和 --test 的冷启动耗时
+    
+    targets 为要对比的程序：.py 文件用当前 Python 解释器运行，其他视为打包后的可执行文件。
+    对比优化前后可先导出旧版本，例如：
+        git show <旧版本>:create_new_attendance_sheet.py > /tmp/old.py
+    """
+    targets = targets or [os.path.join(REPO_DIR, 'create_new_attendance_sheet.py')]
+    print(f"启动耗时基准：每项运行 {runs} 次，取中位数")
+    for target in targets:
+        command = [sys.executable, target] if target.endswith('.py') else [target]
+        print(f"  {target}")
+        for flag in ('--help', '--test'):
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run(command + [flag], cwd=REPO_DIR, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, check=True)
+                timings.append(time.perf_counter() - start)
+            print(f"    {flag:<8} 中位数 {statistics.median(timings):.3f} 秒，最快 {min(timings):.3f} 秒")
+
+
+# 与主程序 --profile 的阶段名称一致；导入为导入主程序和依赖库的耗时
+SCALING_PHASES = ['导入', '读取数据', '员工布局', '创建表头', '填充数据', '写入行和样式', '合并单元格', '保存文件',
+                  '流式写入']
+
+
+def run_phases(source_file, output_file, streaming=False):
+    """在当前进程中生成一次考勤表，返回各阶段耗时（秒）和峰值内存
+
+    读取和布局与主程序相同，之后直接调用主程序的 render_workbook，各阶段由 PhaseProfiler 记录。
+    """
+    start = time.perf_counter()
+    import create_new_attendance_sheet as attendance
+    import numpy  # noqa: F401
+    import openpyxl  # noqa: F401
+    import pandas  # noqa: F401
+    timings = {'导入': time.perf_counter() - start}
+
+    profiler = attendance.PhaseProfiler()
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    days_in_month = attendance.get_days_in_month(year, month)
+    with profiler.phase('读取数据'):
+        employees, positions, departments, punch_matrix = attendance.read_source_data_cached(
+            source_file, use_cache=False)
+    with profiler.phase('员工布局'):
+        roster, punch_positions = attendance.build_roster(employees, positions, punch_matrix)
+        employee_matrix = punch_matrix.take(punch_positions, days_in_month)
+    attendance.render_workbook(output_file, roster, departments, employee_matrix, year, month, days_in_month,
+                               streaming, profiler=profiler)
+    for name, _, wall, _, _ in profiler.phases:
+        timings[name] = timings.get(name, 0) + wall
+
+    return {
+        'employees': len(roster),
+        'phases': timings,
+        'total': sum(timings.values()),
+        'peak_rss_mb': attendance.get_peak_memory_mb(),
+    }
+
+
+def _git_revision():
+    """当前代码版本（git 提交号），不是 git 仓库时返回 None"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def bench_scaling(sizes, days, missing_rate, cross_midnight_rate, seed, streaming, data_dir, json_file,
+                  baseline_file=None):
+    """用合成数据测量不同员工数下各阶段的耗时和峰值内存，结果写入 JSON 文件
+
+    每个规模在独立的子进程中运行，峰值内存互不影响；合成数据按参数缓存在 data_dir 中。
+    """
+    from generate_sample_data import generate_source_file
+
+    data_dir = data_dir or os.path.join(tempfile.gettempdir(), 'attendance_benchmark')
+    baseline = {}
+    if baseline_file:
+        with open(baseline_file, encoding='utf-8') as f:
+            baseline = {result['size']: result for result in json.load(f)['results']}
+
+    print(f"规模基准：{'/'.join(map(str, sizes))} 个员工，缺卡率 {missing_rate}，跨天比例 {cross_midnight_rate}"
+          f"{'，流式写入' if streaming else ''}")
+    print(f"  {'员工数':>8} " + ' '.join(f'{name:>11}' for name in SCALING_PHASES) + f" {'合计':>9} {'峰值内存':>9}")
+    results = []
+    for size in sizes:
+        case_dir = os.path.join(data_dir, f'n{size}_d{days or "all"}_m{missing_rate}_c{cross_midnight_rate}_s{seed}')
+        os.makedirs(case_dir, exist_ok=True)
+        source_file = os.path.join(case_dir, '考勤表-上下班工时统计表2025年7月.xlsx')
+        if not os.path.exists(source_file):
+            generate_source_file(source_file, 2025, 7, size, days, missing_rate, cross_midnight_rate, seed)
+
+        command = [sys.executable, os.path.abspath(__file__), 'scaling-run', source_file,
+                   os.path.join(case_dir, 'output.xlsx')] + (['--streaming'] if streaming else [])
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result['size'] = size
+        results.append(result)
+
+        peak = f"{result['peak_rss_mb']:.0f}MB" if result['peak_rss_mb'] is not None else '-'
+        print(f"  {size:>8} " + ' '.join(f"{result['phases'].get(name, 0):>10.3f}s" for name in SCALING_PHASES)
+              + f" {result['total']:>8.3f}s {peak:>9}")
+        if size in baseline:
+            old = baseline[size]
+            print(f"  {'对比基线':>7} " + ' '.join(
+                f"{result['phases'].get(name, 0) / old['phases'][name]:>10.2f}x" if old['phases'].get(name)
+                else f"{'-':>11}"
+                for name in SCALING_PHASES) + f" {result['total'] / old['total']:>8.2f}x")
+
+    report = {
+        'revision': _git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'days': days, 'missing_rate': missing_rate, 'cross_midnight_rate': cross_midnight_rate,
+            'seed': seed, 'streaming': streaming,
+        },
+        'results': results,
+    }
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {json_file}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='考勤统计表生成工具 - 性能基准测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    styles_parser = subparsers.add_parser('styles', help='样式设置耗时对比')
+    styles_parser.add_argument('--rows', type=int, default=2000, help='行数（默认2000，即1000个员工）')
+    styles_parser.add_argument('--cols', type=int, default=68, help='列数（默认68，即31天）')
+
+    startup_parser = subparsers.add_parser('startup', help='--help / --test 冷启动耗时对比')
+    startup_parser.add_argument('targets', nargs='*',
+                                help='要对比的主程序 .py 文件或打包后的可执行文件（默认当前主程序）')
+    startup_parser.add_argument('--runs', type=int, default=5, help='每项运行次数（默认5）')
+
+    scaling_parser = subparsers.add_parser('scaling', help='合成数据下各阶段耗时和峰值内存随员工数的变化')
+    scaling_parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                                help='员工数（默认 100 1000 10000）')
+    scaling_parser.add_argument('--days', type=int, help='有打卡数据的天数（默认整月）')
+    scaling_parser.add_argument('--missing-rate', type=float, default=0.1, help='缺卡或没有打卡的人天比例（默认0.1）')
+    scaling_parser.add_argument('--cross-midnight-rate', type=float, default=0.05, help='跨天下班的比例（默认0.05）')
+    scaling_parser.add_argument('--seed', type=int, default=0, help='随机种子（默认0）')
+    scaling_parser.add_argument('--streaming', action='store_true', help='使用流式写入模式')
+    scaling_parser.add_argument('--data-dir', help='合成数据和输出文件目录（默认系统临时目录）')
+    scaling_parser.add_argument('--json', default='scaling_results.json',
+                                help='结果 JSON 文件（默认 scaling_results.json）')
+    scaling_parser.add_argument('--baseline', help='之前版本的结果 JSON 文件，逐阶段显示耗时比值')
+
+    # 供 scaling 在子进程中调用，输出一行 JSON
+    run_parser = subparsers.add_parser('scaling-run')
+    run_parser.add_argument('source_file')
+    run_parser.add_argument('output_file')
+    run_parser.add_argument('--streaming', action='store_true')
+
+    args = parser.parse_args()
+
+    if args.command == 'styles':
+        bench_styles(args.rows, args.cols)
+    elif args.command == 'startup':
+        bench_startup(args.targets, args.runs)
+    elif args.command == 'scaling':
+        bench_scaling(args.sizes, args.days, args.missing_rate, args.cross_midnight_rate, args.seed,
+                      args.streaming, args.data_dir, args.json, args.baseline)
+    elif args.command == 'scaling-run':
+        print(json.dumps(run_phases(args.source_file, args.output_file, args.streaming)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+合成数据源文件生成脚本
+
+生成与钉钉导出格式相同的“考勤表-上下班工时统计表YYYY年M月.xlsx”
+（月度汇总 / 打卡时间 两个工作表，表头位置与真实文件一致），用于基准测试和压力测试。
+"""
+
+import argparse
+import calendar
+import os
+import random
+import sys
+
+SUMMARY_HEADERS = ['姓名', '考勤组', '部门', '工号', '职位', 'UserId', '出勤天数', '休息天数', '工作时长']
+PUNCH_HEADERS = ['姓名', '考勤组', '部门', '工号', '职位', 'UserId']
+GROUPS = ['武汉福福数通网络科技有限公司', '直播-主播班', '客服部', '未加入考勤组']
+DEPARTMENTS = ['电商事业部-电商运营', '电商事业部-客服部', '直播事业部-直播主播', '支撑部-研发技术部', '业务中台']
+
+
+def _clock(minutes):
+    """分钟数转换为导出文件中的打卡文字（带尾随空格）"""
+    minutes %= 24 * 60
+    return f'{minutes // 60:02d}:{minutes % 60:02d}  '
+
+
+def generate_punch_cell(rng, missing_rate, cross_midnight_rate):
+    """生成一天的打卡单元格：正常上下班、跨天下班、缺卡或没有打卡"""
+    if rng.random() < missing_rate:
+        # 缺失的一半为整天没有打卡，另一半只有一次打卡
+        return None if rng.random() < 0.5 else _clock(rng.randint(8 * 60, 11 * 60))
+    if rng.random() < cross_midnight_rate:
+        check_in = rng.randint(18 * 60, 23 * 60)
+        check_out = rng.randint(24 * 60 + 60, 24 * 60 + 6 * 60)
+    else:
+        check_in = rng.randint(8 * 60, 10 * 60 + 30)
+        check_out = rng.randint(17 * 60 + 30, 22 * 60)
+    punches = [check_in, check_out]
+    if rng.random() < 0.3:
+        # 部分员工中途还有一次打卡，只取第一条和最后一条
+        punches.insert(1, rng.randint(check_in + 1, check_out - 1))
+    return '\n'.join(_clock(minutes) for minutes in punches)
+
+
+def generate_source_file(output_file, year, month, employees=100, days=None, missing_rate=0.1,
+                         cross_midnight_rate=0.05, seed=0):
+    """生成一个合成数据源文件
+
+    days 为有打卡数据的天数（默认整月），之后的日期留空，用于模拟进行中的月份；
+    missing_rate 为缺卡或没有打卡的人天比例，cross_midnight_rate 为跨天下班的比例。
+    """
+    from openpyxl import Workbook
+    rng = random.Random(seed)
+    days_in_month = calendar.monthrange(year, month)[1]
+    days = days_in_month if days is None else min(days, days_in_month)
+    period = f'统计日期：{year}-{month:02d}-01 至 {year}-{month:02d}-{days_in_month:02d}'
+
+    staff = []
+    for i in range(employees):
+        group = GROUPS[i % len(GROUPS)]
+        department = None if group == '未加入考勤组' else DEPARTMENTS[rng.randrange(len(DEPARTMENTS))]
+        staff.append((f'员工{i + 1:05d}', group, department, None, None, f'{10 ** 15 + i}'))
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('月度汇总')
+    ws.append([f'月度汇总 {period}'])
+    ws.append(['报表生成时间：合成数据'])
+    ws.append(SUMMARY_HEADERS)
+    ws.append([])
+    for row in staff:
+        ws.append(list(row))
+
+    ws = wb.create_sheet('打卡时间')
+    ws.append([f'打卡时间 {period}'])
+    ws.append(['报表生成时间：合成数据'])
+    ws.append(PUNCH_HEADERS + ['打卡时间'] + [None] * (days_in_month - 1))
+    ws.append([None] * len(PUNCH_HEADERS) + [str(day) for day in range(1, days_in_month + 1)])
+    for row in staff:
+        punches = [generate_punch_cell(rng, missing_rate, cross_midnight_rate) for _ in range(days)]
+        ws.append(list(row) + punches)
+    wb.save(output_file)
+    return output_file
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='考勤统计表生成工具 - 合成数据源文件生成')
+    parser.add_argument('--year', '-y', type=int, default=2025, help='年份（默认2025）')
+    parser.add_argument('--month', '-m', type=int, default=7, help='月份（默认7）')
+    parser.add_argument('--employees', '-n', type=int, default=1000, help='员工数（默认1000）')
+    parser.add_argument('--days', type=int, help='有打卡数据的天数（默认整月）')
+    parser.add_argument('--missing-rate', type=float, default=0.1, help='缺卡或没有打卡的人天比例（默认0.1）')
+    parser.add_argument('--cross-midnight-rate', type=float, default=0.05, help='跨天下班的比例（默认0.05）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子（默认0）')
+    parser.add_argument('--output', '-o', help='输出文件（默认当前目录下的标准文件名）')
+    args = parser.parse_args()
+
+    if not 1 <= args.month <= 12:
+        print('错误：月份必须在1-12之间')
+        sys.exit(1)
+    output_file = args.output or f'考勤表-上下班工时统计表{args.year}年{args.month}月.xlsx'
+    generate_source_file(output_file, args.year, args.month, args.employees, args.days, args.missing_rate,
+                         args.cross_midnight_rate, args.seed)
+    print(f'已生成 {args.employees} 个员工的合成数据：{os.path.abspath(output_file)}')
+
+
+if __name__ == "__main__":
+    main()
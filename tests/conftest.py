@@ -0,0 +1,26 @@
+"""pytest 公共配置：把仓库根目录和 scripts/ 加入导入路径，提供恢复日志配置的 fixture"""
+
+import logging
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'scripts'))
+
+
+@pytest.fixture
+def attendance_logging():
+    """测试中调用 configure_logging 或 main() 时，结束后恢复 attendance 日志器原来的配置"""
+    loggers = [logging.getLogger('attendance'), logging.getLogger('attendance.days')]
+    saved = [(log.handlers[:], log.level, log.propagate) for log in loggers]
+    yield
+    for log, (handlers, level, propagate) in zip(loggers, saved):
+        for handler in log.handlers:
+            if handler not in handlers:
+                handler.close()
+        log.handlers[:] = handlers
+        log.setLevel(level)
+        log.propagate = propagate
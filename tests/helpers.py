@@ -0,0 +1,80 @@
+"""测试共用的常量、参考实现和读取输出文件的辅助函数"""
+
+import os
+import random
+
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_FILES = sorted(
+    os.path.join(REPO_DIR, name) for name in os.listdir(REPO_DIR)
+    if name.startswith('考勤表-上下班工时统计表') and name.endswith('.xlsx')
+)
+
+
+def reference_parse_punch_times(time_str):
+    """逐个单元格的参考实现：按换行拆分，取第一条和最后一条"""
+    if pd.isna(time_str) or time_str == '':
+        return None, None
+    times = [t.strip() for t in str(time_str).split('\n') if t.strip()]
+    if len(times) == 0:
+        return None, None
+    elif len(times) == 1:
+        return times[0], None
+    return times[0], times[-1]
+
+
+def reference_calculate_work_hours(check_in_time, check_out_time):
+    """逐个单元格的参考实现：跨天时按 (24:00 - 签到) + 签退 计算"""
+    if not check_in_time or not check_out_time:
+        return 0.0
+
+    def parse_time(time_str):
+        try:
+            if ':' in time_str:
+                hours, minutes = map(int, time_str.split(':'))
+                return hours + minutes / 60.0
+            return float(time_str)
+        except ValueError:
+            return 0.0
+
+    check_in_hours = parse_time(check_in_time)
+    check_out_hours = parse_time(check_out_time)
+    if check_in_hours == 0 or check_out_hours == 0:
+        return 0.0
+    if check_in_hours > check_out_hours:
+        work_hours = (24.0 - check_in_hours) + check_out_hours
+    else:
+        work_hours = check_out_hours - check_in_hours
+    return max(0.0, work_hours)
+
+
+def random_punch_cells(seed, count):
+    """随机生成打卡单元格：包含正常时间、边界时间、空白、非法文字和缺失值"""
+    rng = random.Random(seed)
+    tokens = ['08:30', '23:59', '00:00', '00:01', ' 9:5 ', '8.5', 'abc', '', '  ',
+              '12:00:00', '-1:30', '7', '24:00', '10:14  ']
+    cells = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            cells.append(f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}\n'
+                         f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}')
+        else:
+            cells.append('\n'.join(rng.choice(tokens) for _ in range(rng.randint(0, 4))))
+    return cells + [None, float('nan'), '']
+
+
+def read_sheet(path):
+    """读取输出文件每个工作表的单元格值和合并区域"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(path)
+    return [([[cell.value for cell in row] for row in ws.iter_rows()],
+             sorted(str(merged) for merged in ws.merged_cells.ranges)) for ws in workbook.worksheets]
+
+
+def read_cell_styles(path):
+    """读取输出文件每个单元格的样式名和数字格式"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(path)
+    return [[[(cell.style, cell.number_format) for cell in row] for row in ws.iter_rows()]
+            for ws in workbook.worksheets]
@@ -0,0 +1,38 @@
+"""库接口测试：process_attendance 和 AttendanceResult"""
+
+import os
+
+import numpy as np
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import SOURCE_FILES, read_sheet
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+def test_process_attendance_in_memory_matches_cli(tmp_path, monkeypatch):
+    source_file = SOURCE_FILES[-1]
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    expected = str(tmp_path / 'expected.xlsx')
+    attendance.create_new_attendance_sheet(source_file, expected, year, month, use_cache=False)
+
+    # bytes 输入没有文件名，需要指定年月；全程不在工作目录下创建文件
+    work_dir = tmp_path / 'work'
+    work_dir.mkdir()
+    monkeypatch.chdir(work_dir)
+    with open(source_file, 'rb') as f:
+        data = f.read()
+    with pytest.raises(ValueError):
+        attendance.process_attendance(data)
+    result = attendance.process_attendance(data, year, month)
+    buffer = result.to_xlsx()
+    assert os.listdir(work_dir) == []
+    assert read_sheet(buffer) == read_sheet(expected)
+
+    with open(source_file, 'rb') as f:
+        from_file = attendance.process_attendance(f)
+    assert (from_file.year, from_file.month) == (year, month)
+    np.testing.assert_array_equal(from_file.hours, result.hours)
+    days = attendance.get_days_in_month(year, month)
+    assert result.hours.shape == (len(result.employees), days)
+    np.testing.assert_allclose(np.nansum(result.hours, axis=1), result.totals['total_hours'])
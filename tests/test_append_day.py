@@ -0,0 +1,55 @@
+"""按日追加测试"""
+
+import os
+
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import SOURCE_FILES, read_sheet
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+def test_append_day_matches_full_generation(tmp_path):
+    source_file = SOURCE_FILES[-1]
+    appended = str(tmp_path / 'appended.xlsx')
+    full = str(tmp_path / 'full.xlsx')
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    # 第一次完整生成，之后逐日追加（重复追加同一天结果不变）
+    for day in (2, 3, 4, 3):
+        attendance.create_new_attendance_sheet(source_file, appended, year, month, use_cache=False,
+                                               append_day=day)
+    attendance.create_new_attendance_sheet(source_file, full, year, month, use_cache=False, append_day=4)
+    assert read_sheet(appended) == read_sheet(full)
+    # 数据缺失的条件格式范围随追加的日期延伸
+    assert missing_sqrefs(appended) == missing_sqrefs(full)
+    assert missing_sqrefs(full)[0].startswith('D8:J')
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+def test_full_rebuild_keeps_later_appended_days(tmp_path):
+    import openpyxl
+    source_file = SOURCE_FILES[-1]
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    appended = str(tmp_path / 'appended.xlsx')
+    full = str(tmp_path / 'full.xlsx')
+    for day in (2, 3, 4):
+        attendance.create_new_attendance_sheet(source_file, appended, year, month, use_cache=False,
+                                               append_day=day)
+    # 员工名单变化（打卡表中的姓名改了）后重新追加第 3 天，完整生成时仍要填写到第 4 天
+    renamed_source = str(tmp_path / 'renamed.xlsx')
+    workbook = openpyxl.load_workbook(source_file)
+    workbook['打卡时间'].cell(row=9, column=1).value = '新员工'
+    workbook.save(renamed_source)
+    attendance.create_new_attendance_sheet(renamed_source, appended, year, month, use_cache=False, append_day=3)
+    attendance.create_new_attendance_sheet(renamed_source, full, year, month, use_cache=False, append_day=4)
+    assert read_sheet(appended) == read_sheet(full)
+    assert attendance.load_append_state(appended)['through_day'] == 4
+    # 之后继续追加第 5 天仍走按日追加
+    attendance.create_new_attendance_sheet(renamed_source, appended, year, month, use_cache=False, append_day=5)
+    attendance.create_new_attendance_sheet(renamed_source, full, year, month, use_cache=False, append_day=5)
+    assert read_sheet(appended) == read_sheet(full)
+
+
+def missing_sqrefs(path):
+    import openpyxl
+    return [str(rule.sqref) for ws in openpyxl.load_workbook(path).worksheets for rule in ws.conditional_formatting]
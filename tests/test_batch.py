@@ -0,0 +1,35 @@
+"""批量模式测试"""
+
+import logging
+import os
+
+import create_new_attendance_sheet as attendance
+from generate_sample_data import generate_source_file
+from helpers import read_sheet
+
+
+def test_batch_matches_single_month_runs(tmp_path, monkeypatch, caplog):
+    # 每个月份在子进程中生成，结果与单独生成相同；一个文件失败不影响其他文件
+    monkeypatch.chdir(tmp_path)
+    source_files = []
+    for month in (6, 7):
+        source_file = f'考勤表-上下班工时统计表2025年{month}月.xlsx'
+        generate_source_file(source_file, 2025, month, employees=12, seed=month)
+        source_files.append(source_file)
+    broken = '考勤表-上下班工时统计表2025年8月.xlsx'
+    with open(broken, 'wb') as f:
+        f.write(b'not an xlsx file')
+
+    with caplog.at_level(logging.INFO, logger='attendance'):
+        failed = attendance.run_batch(source_files + [broken], jobs=2, use_cache=False)
+    assert failed == 1
+    assert f'❌ {broken}' in caplog.text
+    assert not os.path.exists(attendance.get_batch_output_file(broken))
+
+    os.mkdir('single')
+    for month, source_file in zip((6, 7), source_files):
+        output_file = attendance.get_batch_output_file(source_file)
+        assert f'✅ {source_file} -> {output_file}' in caplog.text
+        expected = os.path.join('single', output_file)
+        attendance.create_new_attendance_sheet(source_file, expected, 2025, month, use_cache=False)
+        assert read_sheet(output_file) == read_sheet(expected)
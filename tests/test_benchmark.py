@@ -0,0 +1,26 @@
+"""基准测试脚本的冒烟测试"""
+
+import os
+
+
+def test_benchmark_styles_smoke(capsys):
+    # 基准脚本直接调用写入器，接口变化时在这里发现
+    import benchmark
+    benchmark.bench_styles(4, 6)
+    assert '加速比' in capsys.readouterr().out
+
+
+def test_benchmark_run_phases_uses_render_workbook(tmp_path):
+    import benchmark
+    from generate_sample_data import generate_source_file
+    source_file = str(tmp_path / '考勤表-上下班工时统计表2025年7月.xlsx')
+    generate_source_file(source_file, 2025, 7, employees=10)
+    # 普通模式和流式模式合起来覆盖所有阶段，没有漏记的阶段
+    phases = set()
+    for streaming in (False, True):
+        output_file = tmp_path / f'out{streaming:d}.xlsx'
+        result = benchmark.run_phases(source_file, str(output_file), streaming)
+        assert result['employees'] > 0 and set(result['phases']) <= set(benchmark.SCALING_PHASES)
+        assert os.path.exists(output_file)
+        phases |= set(result['phases'])
+    assert phases == set(benchmark.SCALING_PHASES)
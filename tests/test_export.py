@@ -0,0 +1,41 @@
+"""平面表导出测试：CSV 和 Parquet"""
+
+import os
+
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import SOURCE_FILES
+
+
+def test_parquet_without_engine_is_an_error(monkeypatch):
+    # 没有 parquet 引擎时报错，而不是悄悄改为其他格式
+    import importlib.util
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec',
+                        lambda name, *args: None if name in ('pyarrow', 'fastparquet') else find_spec(name, *args))
+    with pytest.raises(ValueError, match='pyarrow'):
+        attendance.resolve_export_formats(['xlsx', 'parquet'])
+    assert attendance.resolve_export_formats(['csv', 'xlsx', 'csv']) == ['csv', 'xlsx']
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+@pytest.mark.parametrize('source_file', SOURCE_FILES)
+def test_flat_csv_matches_flat_tables(source_file, tmp_path):
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    output_file = str(tmp_path / 'out.xlsx')
+    assert attendance.create_new_attendance_sheet(
+        source_file, output_file, year, month, use_cache=False, formats=['csv']) == str(tmp_path / 'out.csv')
+    assert not os.path.exists(output_file)
+
+    # CSV 由 build_flat_tables 的同一组表格写出，与 DataFrame.to_csv 的结果逐字节相同
+    employees, positions, departments, punch_matrix = attendance.read_source_data_cached(
+        source_file, use_cache=False)
+    roster, punch_positions = attendance.build_roster(employees, positions, punch_matrix)
+    days = attendance.get_days_in_month(year, month)
+    employee_matrix = punch_matrix.take(punch_positions, days)
+    for frame, path in zip(attendance.build_flat_tables(roster, departments, employee_matrix, year, month, days),
+                           attendance.get_export_files(output_file, 'csv')):
+        expected = frame.to_csv(index=False, lineterminator='\n')
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            assert f.read() == expected
@@ -0,0 +1,71 @@
+"""增量更新测试：按 XML 改写有变化的员工行，结果与完整生成相同"""
+
+import os
+import logging
+import shutil
+
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import REPO_DIR, read_cell_styles, read_sheet
+
+
+def edit_punches(source_file, target_file, edits):
+    """复制数据源并改写打卡时间表中的单元格，edits 为 {(行号, 列号): 值}"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(source_file)
+    ws = workbook['打卡时间']
+    for (row, col), value in edits.items():
+        ws.cell(row=row, column=col).value = value
+    workbook.save(target_file)
+
+
+# 7月样例中有打卡记录的员工：改动打卡时间、写入需要 XML 转义的非标准打卡文字、清空某一天
+INCREMENTAL_EDITS = {(9, 8): '09:00  \n18:30  ', (10, 8): '08:54 <外勤&>\n19:00', (8, 9): None}
+
+
+INCREMENTAL_SOURCE = os.path.join(REPO_DIR, '考勤表-上下班工时统计表2025年7月.xlsx')
+
+
+@pytest.mark.skipif(not os.path.exists(INCREMENTAL_SOURCE), reason='缺少示例数据源文件')
+@pytest.mark.parametrize('layout', [{}, {'streaming': True}, {'sheet_per_position': True, 'rollup': True}])
+def test_incremental_patch_matches_full_rebuild(layout, tmp_path, caplog):
+    edited_source = str(tmp_path / 'edited.xlsx')
+    edit_punches(INCREMENTAL_SOURCE, edited_source, INCREMENTAL_EDITS)
+    incremental = str(tmp_path / 'incremental.xlsx')
+    full = str(tmp_path / 'full.xlsx')
+    attendance.create_new_attendance_sheet(INCREMENTAL_SOURCE, incremental, 2025, 7, use_cache=False,
+                                           incremental=True, **layout)
+    with caplog.at_level(logging.INFO, logger='attendance'):
+        attendance.create_new_attendance_sheet(edited_source, incremental, 2025, 7, use_cache=False,
+                                               incremental=True, **layout)
+    assert f'增量更新：{len(INCREMENTAL_EDITS)} 个员工的打卡数据有变化' in caplog.text
+    attendance.create_new_attendance_sheet(edited_source, full, 2025, 7, use_cache=False, **layout)
+    assert read_sheet(incremental) == read_sheet(full)
+    assert read_cell_styles(incremental) == read_cell_styles(full)
+    assert '08:54 <外勤&>' in [value for values, _ in read_sheet(incremental) for row in values for value in row]
+
+
+@pytest.mark.skipif(not os.path.exists(INCREMENTAL_SOURCE), reason='缺少示例数据源文件')
+@pytest.mark.parametrize('stale', ['touched', 'layout'])
+def test_incremental_falls_back_to_full_rebuild(stale, tmp_path, caplog):
+    edited_source = str(tmp_path / 'edited.xlsx')
+    edit_punches(INCREMENTAL_SOURCE, edited_source, INCREMENTAL_EDITS)
+    incremental = str(tmp_path / 'incremental.xlsx')
+    full = str(tmp_path / 'full.xlsx')
+    attendance.create_new_attendance_sheet(INCREMENTAL_SOURCE, incremental, 2025, 7, use_cache=False,
+                                           incremental=True)
+    layout = {}
+    if stale == 'touched':
+        # 输出文件在上次生成后被改动过，指纹中的大小和修改时间不再匹配
+        shutil.copyfile(INCREMENTAL_SOURCE, incremental)
+    else:
+        # 指纹记录的是不分表的布局
+        layout = {'sheet_per_position': True}
+    with caplog.at_level(logging.INFO, logger='attendance'):
+        attendance.create_new_attendance_sheet(edited_source, incremental, 2025, 7, use_cache=False,
+                                               incremental=True, **layout)
+    assert '完整生成考勤表' in caplog.text
+    attendance.create_new_attendance_sheet(edited_source, full, 2025, 7, use_cache=False, **layout)
+    assert read_sheet(incremental) == read_sheet(full)
+    assert read_cell_styles(incremental) == read_cell_styles(full)
@@ -0,0 +1,58 @@
+"""日志参数测试：--quiet、--verbose 和 --log-json"""
+
+import json
+import sys
+
+import pytest
+
+import create_new_attendance_sheet as attendance
+from generate_sample_data import generate_source_file
+
+
+@pytest.fixture
+def source_file(tmp_path, monkeypatch):
+    # 年月从 --input 的文件名解析，在数据源所在目录下运行
+    monkeypatch.chdir(tmp_path)
+    source_file = '考勤表-上下班工时统计表2025年7月.xlsx'
+    generate_source_file(source_file, 2025, 7, employees=12)
+    return source_file
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['create_new_attendance_sheet.py', '--no-cache', *args])
+    attendance.main()
+
+
+def test_quiet_and_verbose_levels(source_file, tmp_path, monkeypatch, capsys, attendance_logging):
+    output_file = str(tmp_path / 'out.xlsx')
+    outputs = {}
+    for flag in ('', '--quiet', '--verbose'):
+        run_main(monkeypatch, '-i', source_file, '-o', output_file, *filter(None, [flag]))
+        outputs[flag] = capsys.readouterr().out
+    # 默认输出每个员工的汇总，--verbose 再加上每天的明细，--quiet 两者都不输出
+    assert '处理完成' in outputs[''] and '累计工作时长' in outputs[''] and ': 签到' not in outputs['']
+    assert '累计工作时长' in outputs['--verbose'] and ': 签到' in outputs['--verbose']
+    assert '处理完成' not in outputs['--quiet'] and '累计工作时长' not in outputs['--quiet']
+
+
+def test_log_json_writes_one_record_per_worked_day(source_file, tmp_path, monkeypatch, capsys,
+                                                   attendance_logging):
+    log_file = tmp_path / 'days.jsonl'
+    run_main(monkeypatch, '-i', source_file, '-o', str(tmp_path / 'out.xlsx'), '-q', '--log-json', str(log_file))
+    # 明细只写入文件，不受 --quiet 影响，也不出现在控制台
+    assert ': 签到' not in capsys.readouterr().out
+    with open(log_file, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+
+    employees, positions, departments, punch_matrix = attendance.read_source_data_cached(
+        source_file, use_cache=False)
+    roster, punch_positions = attendance.build_roster(employees, positions, punch_matrix)
+    employee_matrix = punch_matrix.take(punch_positions, 31)
+    worked = employee_matrix.worked()
+    assert len(records) == worked.sum()
+    assert {record['employee'] for record in records} == {
+        employee_key[0] for employee_key, _, has_punch in roster if has_punch}
+    assert all(record['date'].startswith('2025-07-') and record['check_in'] and record['check_out']
+               for record in records)
+    assert sum(record['hours'] for record in records) == pytest.approx(
+        employee_matrix.work_hours()[worked].round(2).sum(), abs=0.01)
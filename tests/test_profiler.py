@@ -0,0 +1,44 @@
+"""--profile 各阶段耗时统计测试"""
+
+import io
+import os
+import json
+import logging
+
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import SOURCE_FILES, read_sheet
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+def test_profiler_records_phases_without_changing_output(tmp_path):
+    source_file = SOURCE_FILES[-1]
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    plain = str(tmp_path / 'plain.xlsx')
+    profiled = str(tmp_path / 'profiled.xlsx')
+    trace_file = str(tmp_path / 'trace.json')
+    attendance.create_new_attendance_sheet(source_file, plain, year, month, use_cache=False)
+    profiler = attendance.PhaseProfiler(trace_file)
+    attendance.create_new_attendance_sheet(source_file, profiled, year, month, use_cache=False, profiler=profiler)
+    profiler.finish()
+    assert read_sheet(profiled) == read_sheet(plain)
+
+    with open(trace_file, encoding='utf-8') as f:
+        events = json.load(f)['traceEvents']
+    names = [event['name'] for event in events]
+    assert names[:3] == ['读取数据', '员工布局', '创建表头'] and names[-2:] == ['保存文件', '写入结果库']
+    assert all(event['dur'] >= 0 and event['ph'] == 'X' for event in events)
+
+
+def test_profile_table_survives_quiet(capsys, attendance_logging):
+    # 汇总表是报告而不是日志：--quiet 时照常输出到标准输出，不经过日志
+    log = io.StringIO()
+    attendance.configure_logging(logging.WARNING, stream=log)
+    profiler = attendance.PhaseProfiler()
+    with profiler.phase('读取数据'):
+        pass
+    profiler.finish()
+    out = capsys.readouterr().out
+    assert '各阶段耗时' in out and '读取数据' in out and '合计' in out
+    assert log.getvalue() == ''
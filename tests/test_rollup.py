@@ -0,0 +1,25 @@
+"""汇总工作表测试"""
+
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import SOURCE_FILES
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+def test_rollup_totals_match_employee_rows():
+    employees, positions, departments, punch_matrix = attendance.read_source_data_cached(
+        SOURCE_FILES[-1], use_cache=False)
+    roster, punch_positions = attendance.build_roster(employees, positions, punch_matrix)
+    employee_matrix = punch_matrix.take(punch_positions, 31)
+    _, summaries = attendance.build_employee_rows(roster, employee_matrix, 2025, 7, 31)
+    rows = [values for values, style in attendance.build_rollup_rows(
+        roster, departments, employee_matrix, 2025, 7, 31) if style == attendance.ROLLUP_ROW_STYLES]
+
+    # 岗位、部门两张表的合计行相同，且与逐个员工的累计时长、工作天数一致
+    totals = [values for values in rows if values[0] == '合计']
+    assert totals[0] == totals[1]
+    assert totals[0][1] == len(roster)
+    assert float(totals[0][2]) == pytest.approx(sum(summary[3] for summary in summaries), abs=0.01)
+    assert totals[0][3] == sum(summary[4] for summary in summaries)
+    assert sum(values[1] for values in rows[:rows.index(totals[0])]) == len(roster)
@@ -0,0 +1,40 @@
+"""员工与打卡记录匹配测试：同名员工和岗位不一致时按姓名匹配"""
+
+import pytest
+
+import create_new_attendance_sheet as attendance
+
+
+def punch_matrix_for(names, groups):
+    """每个打卡行的第 1 天签到时间不同，便于确认匹配到的是哪一行"""
+    records = [attendance.PunchRecord(name, group, (f'{8 + i:02d}:00\n18:00',) + (None,) * 30)
+               for i, (name, group) in enumerate(zip(names, groups))]
+    return attendance.PunchMatrix.from_records(records)
+
+
+@pytest.mark.parametrize('positions, groups, expected', [
+    # 同名同岗位按出现顺序匹配
+    (['客服部', '客服部'], ['客服部', '客服部'], [0, 1]),
+    # 第二个员工岗位不一致，按姓名匹配时跳过已分配给第一个员工的行
+    (['客服部', '直播班'], ['客服部', '直播-主播班'], [0, 1]),
+    # 岗位不一致的员工排在前面，也不能占用后面岗位一致的员工的行
+    (['直播班', '客服部'], ['客服部', '直播-主播班'], [1, 0]),
+    # 两个员工岗位都不一致，按顺序分配
+    (['直播班', '运营部'], ['客服部', '直播-主播班'], [0, 1]),
+])
+def test_duplicate_names_get_distinct_punch_rows(positions, groups, expected):
+    punch_matrix = punch_matrix_for(['张三', '张三'], groups)
+    roster, punch_positions = attendance.build_roster(['张三', '张三'], positions, punch_matrix)
+    assert punch_positions == expected
+    assert [has_punch for _, _, has_punch in roster] == [True, True]
+    check_ins = punch_matrix.take(punch_positions, 1).punch_texts(0)[:, 0].tolist()
+    assert check_ins == [f'{8 + row:02d}:00' for row in expected]
+
+
+def test_extra_duplicate_has_no_punches():
+    # 月度汇总中的同名员工多于打卡记录时，多出的员工没有打卡记录，而不是重复使用别人的
+    punch_matrix = punch_matrix_for(['张三', '李四'], ['客服部', '客服部'])
+    roster, punch_positions = attendance.build_roster(['张三', '张三', '李四'], ['客服部', '直播班', '客服部'],
+                                                      punch_matrix)
+    assert punch_positions == [0, 1]
+    assert [has_punch for _, _, has_punch in roster] == [True, False, True]
@@ -0,0 +1,113 @@
+"""工作表写入测试：写入器、--jobs 并行生成和输出单元格格式"""
+
+import os
+
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import SOURCE_FILES, read_cell_styles, read_sheet
+
+
+def test_base_sheet_writer_is_abstract():
+    # 误用基类时在创建时就报错，而不是写到一半才失败
+    with pytest.raises(TypeError):
+        attendance._BaseSheetWriter(None, {}, 1)
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+@pytest.mark.parametrize('layout', [{}, {'streaming': True}, {'sheet_per_position': True, 'rollup': True}])
+def test_parallel_rows_match_serial(layout, tmp_path):
+    # --jobs 时员工行在子进程中直接生成 XML，结果应与逐个单元格写入相同
+    source_file = SOURCE_FILES[-1]
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    serial = str(tmp_path / 'serial.xlsx')
+    parallel = str(tmp_path / 'parallel.xlsx')
+    attendance.create_new_attendance_sheet(source_file, serial, year, month, use_cache=False, **layout)
+    attendance.create_new_attendance_sheet(source_file, parallel, year, month, use_cache=False, jobs=3, **layout)
+    assert read_sheet(parallel) == read_sheet(serial)
+
+    import openpyxl
+    for ws_serial, ws_parallel in zip(openpyxl.load_workbook(serial).worksheets,
+                                      openpyxl.load_workbook(parallel).worksheets):
+        assert ws_parallel.dimensions == ws_serial.dimensions
+        assert ([str(rule.sqref) for rule in ws_parallel.conditional_formatting]
+                == [str(rule.sqref) for rule in ws_serial.conditional_formatting])
+        for row_serial, row_parallel in zip(ws_serial.iter_rows(min_row=8), ws_parallel.iter_rows(min_row=8)):
+            assert [(cell.style, cell.number_format) for cell in row_parallel] == [
+                (cell.style, cell.number_format) for cell in row_serial]
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+@pytest.mark.parametrize('layout', [{}, {'sheet_per_position': True, 'rollup': True, 'rules': attendance.ShiftRules()},
+                                    {'append_day': 10}])
+def test_streaming_matches_normal(layout, tmp_path, monkeypatch):
+    # 流式模式分批生成和写出员工行（批大小设小一些，跨过多个批），结果与普通模式逐个单元格相同
+    monkeypatch.setattr(attendance, 'STREAMING_CHUNK_SIZE', 3)
+    source_file = SOURCE_FILES[-1]
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    normal = str(tmp_path / 'normal.xlsx')
+    streaming = str(tmp_path / 'streaming.xlsx')
+    attendance.create_new_attendance_sheet(source_file, normal, year, month, use_cache=False, **layout)
+    attendance.create_new_attendance_sheet(source_file, streaming, year, month, use_cache=False, streaming=True,
+                                           **layout)
+    assert read_sheet(streaming) == read_sheet(normal)
+    assert read_cell_styles(streaming) == read_cell_styles(normal)
+
+    import openpyxl
+    for ws_normal, ws_streaming in zip(openpyxl.load_workbook(normal).worksheets,
+                                       openpyxl.load_workbook(streaming).worksheets):
+        assert ws_streaming.title == ws_normal.title
+        assert ([str(rule.sqref) for rule in ws_streaming.conditional_formatting]
+                == [str(rule.sqref) for rule in ws_normal.conditional_formatting])
+        for row_normal, row_streaming in zip(ws_normal.iter_rows(), ws_streaming.iter_rows()):
+            assert [(repr(cell.border), repr(cell.font), repr(cell.alignment)) for cell in row_streaming] == [
+                (repr(cell.border), repr(cell.font), repr(cell.alignment)) for cell in row_normal]
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+@pytest.mark.parametrize('options', [{}, {'streaming': True}, {'jobs': 2}])
+def test_check_out_rows_omit_merged_cells(options, tmp_path):
+    # 签退行只写出签退时间等有内容的单元格，合并区域的下半部分由行默认样式显示
+    import zipfile
+    source_file = SOURCE_FILES[-1]
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    output_file = str(tmp_path / 'out.xlsx')
+    attendance.create_new_attendance_sheet(source_file, output_file, year, month, use_cache=False, **options)
+    with zipfile.ZipFile(output_file) as archive:
+        xml = archive.read('xl/worksheets/sheet1.xml').decode()
+    check_out_row = xml[xml.index('<row r="9"'):xml.index('</row>', xml.index('<row r="9"'))]
+    assert 'customFormat="1"' in check_out_row
+    assert '<c r="A9"' not in check_out_row and '<c r="E9"' not in check_out_row
+    assert '<c r="C9"' in check_out_row and '<c r="D9"' in check_out_row
+    import openpyxl
+    ws = openpyxl.load_workbook(output_file).active
+    assert ws['E9'].border.bottom.style == 'thin' and 'E8:E9' in {str(r) for r in ws.merged_cells.ranges}
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+def test_output_cells_are_numeric(tmp_path):
+    import datetime
+    import openpyxl
+    from openpyxl.cell.cell import MergedCell
+    source_file = SOURCE_FILES[-1]
+    year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+    output_file = str(tmp_path / 'out.xlsx')
+    attendance.create_new_attendance_sheet(source_file, output_file, year, month, use_cache=False)
+    ws = openpyxl.load_workbook(output_file).active
+    days = attendance.get_days_in_month(year, month)
+    summary_col = 4 + days * 2
+    punches, hours, blanks = 0, 0, 0
+    for row in ws.iter_rows(min_row=8, max_col=summary_col):
+        for cell in row[3:]:
+            if cell.column % 2 == 0 and cell.column < summary_col:
+                assert cell.number_format == 'hh:mm'
+                # 不能由分钟数还原的打卡（如 '08:54外勤'）保留原文字
+                assert cell.value is None or isinstance(cell.value, (datetime.time, str))
+                punches += isinstance(cell.value, datetime.time)
+                blanks += cell.value is None
+            elif not isinstance(cell, MergedCell):
+                assert cell.number_format == '0.00'
+                assert cell.value is None or isinstance(cell.value, (int, float))
+                hours += cell.value is not None
+    assert punches and hours and blanks
+    assert '数据缺失' not in {cell.value for row in ws.iter_rows(min_row=8) for cell in row}
@@ -0,0 +1,51 @@
+"""迟到、早退、加班和缺卡统计测试"""
+
+import numpy as np
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import random_punch_cells, reference_calculate_work_hours, reference_parse_punch_times
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_employee_stats_match_reference(seed):
+    cells = random_punch_cells(seed, 31 * 40)
+    punches = [tuple(cells[i:i + 31]) for i in range(0, 31 * 40, 31)]
+    records = [attendance.PunchRecord(f'员工{i}', '', row) for i, row in enumerate(punches)]
+    punch_matrix = attendance.PunchMatrix.from_records(records)
+    rules = attendance.ShiftRules(attendance.parse_clock('09:00'), attendance.parse_clock('18:00'), 8)
+    stats = attendance.compute_employee_stats(punch_matrix, 30, rules)
+
+    # 打卡文字到分钟数的换算沿用 punch_minutes（无法解析的时间按 0 点处理）
+    texts = sorted({text for cell in cells[:-3] for text in reference_parse_punch_times(cell) if text})
+    minutes = dict(zip(texts, attendance.punch_minutes(np.array(texts, dtype=object)).tolist())).get
+
+    for row, cells_row in enumerate(punches):
+        expected = dict(processed=0, work_days=0, total_hours=0.0, late=0, early=0, overtime=0.0, missing=0)
+        for cell in cells_row[:30]:
+            check_in, check_out = reference_parse_punch_times(cell)
+            if check_in is None:
+                continue
+            expected['processed'] += 1
+            expected['late'] += 9 * 60 < minutes(check_in) < 18 * 60
+            if check_out is None:
+                expected['missing'] += 1
+                continue
+            hours = reference_calculate_work_hours(check_in, check_out)
+            expected['work_days'] += 1
+            expected['total_hours'] += hours
+            expected['overtime'] += max(round(hours * 60) - 8 * 60, 0) / 60
+            expected['early'] += hours > 0 and minutes(check_in) <= minutes(check_out) < 18 * 60
+        expected['rest_days'] = 30 - expected['processed']
+        for key, value in expected.items():
+            assert stats[key][row] == pytest.approx(value), (key, row)
+
+
+def test_night_shift_is_not_late():
+    # 夜班 21:00 签到、次日签退：不算迟到也不算早退；只有签到没有签退的夜班也不算迟到
+    cells = ['21:00\n06:00', '22:30', '09:30\n18:00', '10:00\n01:00', '08:50\n17:00'] + [None] * 26
+    punch_matrix = attendance.PunchMatrix.from_records([attendance.PunchRecord('张三', '', tuple(cells))])
+    rules = attendance.ShiftRules(attendance.parse_clock('09:00'), attendance.parse_clock('18:00'))
+    stats = attendance.compute_employee_stats(punch_matrix, 31, rules)
+    # 9:30 和 10:00 签到算迟到（10:00 上班、次日下班仍是晚到的白班），17:00 签退算早退
+    assert (stats['late'][0], stats['early'][0], stats['missing'][0]) == (2, 1, 1)
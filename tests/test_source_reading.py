@@ -0,0 +1,51 @@
+"""数据源读取测试：解析缓存和只读模式读取与 pandas 读取结果一致"""
+
+import numpy as np
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import SOURCE_FILES
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+@pytest.mark.parametrize('source_file', SOURCE_FILES)
+def test_cached_source_matches_excel(source_file, tmp_path):
+    cache_dir = str(tmp_path)
+    employees, positions, departments, punch_records = attendance.read_source_data(source_file)
+    punch_matrix = attendance.PunchMatrix.from_records(punch_records)
+    assert attendance.load_cached_source(source_file, cache_dir=cache_dir) is None
+
+    attendance.save_cached_source(source_file, (employees, positions, departments, punch_matrix),
+                                  cache_dir=cache_dir)
+    cached_employees, cached_positions, cached_departments, cached_matrix = attendance.load_cached_source(
+        source_file, cache_dir=cache_dir)
+    assert cached_employees == employees
+    assert cached_positions == positions
+    assert cached_departments == departments
+    assert attendance.build_punch_index(cached_matrix) == attendance.build_punch_index(punch_matrix)
+
+    for kind in (0, 1):
+        assert np.array_equal(cached_matrix.punch_texts(kind), punch_matrix.punch_texts(kind))
+    assert np.array_equal(cached_matrix.work_hours(), punch_matrix.work_hours())
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+@pytest.mark.parametrize('source_file', SOURCE_FILES)
+def test_readonly_reader_matches_pandas(source_file):
+    employees, positions, departments, punch_records = attendance.read_source_data(source_file)
+    ro_employees, ro_positions, ro_departments, ro_records = attendance.read_source_data(
+        source_file, engine='readonly')
+    assert ro_employees == employees
+    assert ro_positions == positions
+    assert ro_departments == departments
+    assert len(departments) == len(employees)
+
+    # 只读模式跳过空行，按姓名逐条对比
+    named = [record for record in punch_records if not attendance._is_missing(record.name)]
+    ro_named = [record for record in ro_records if not attendance._is_missing(record.name)]
+    assert [(r.name, r.group) for r in ro_named] == [(r.name, r.group) for r in named]
+    for record, ro_record in zip(named, ro_named):
+        check_in, check_out = attendance.parse_punch_block([record.punches])
+        ro_in, ro_out = attendance.parse_punch_block([ro_record.punches])
+        assert np.array_equal(check_in, ro_in)
+        assert np.array_equal(check_out, ro_out)
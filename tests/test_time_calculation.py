@@ -0,0 +1,88 @@
+"""时间计算逻辑测试
+
+覆盖标量接口、批量（向量化）接口和打卡矩阵，并用随机生成的打卡数据对比批量结果与逐个单元格的计算结果。
+"""
+
+import numpy as np
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import random_punch_cells, reference_calculate_work_hours, reference_parse_punch_times
+
+
+@pytest.mark.parametrize('check_in, check_out, expected', [
+    ('08:30', '18:30', 10.0),
+    ('09:00', '17:00', 8.0),
+    ('22:00', '06:00', 8.0),
+    ('23:00', '07:00', 8.0),
+    pytest.param('00:00', '08:00', 8.0, marks=pytest.mark.xfail(
+        strict=True, reason='00:00 打卡目前按无效时间处理，工作时长为 0')),
+    ('08:00', '08:00', 0.0),
+    ('18:30', '08:30', 14.0),
+    ('', '18:30', 0.0),
+    ('08:30', '', 0.0),
+    ('', '', 0.0),
+])
+def test_calculate_work_hours(check_in, check_out, expected):
+    assert attendance.calculate_work_hours(check_in, check_out) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('time_str, expected', [
+    ('08:30\n18:30', ('08:30', '18:30')),
+    ('08:30\n12:00\n18:30', ('08:30', '18:30')),
+    (' 08:30 \n\n 18:30 ', ('08:30', '18:30')),
+    ('08:30', ('08:30', None)),
+    ('', (None, None)),
+    (None, (None, None)),
+    (float('nan'), (None, None)),
+])
+def test_parse_punch_times(time_str, expected):
+    assert attendance.parse_punch_times(time_str) == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_batch_matches_reference(seed):
+    cells = random_punch_cells(seed, 2000)
+    block = np.array(cells, dtype=object).reshape(-1, 1)
+    check_in, check_out = attendance.parse_punch_block(block)
+    hours = attendance.calculate_work_hours_batch(check_in, check_out)
+
+    for i, cell in enumerate(cells):
+        expected_in, expected_out = reference_parse_punch_times(cell)
+        assert (check_in[i, 0], check_out[i, 0]) == (expected_in, expected_out), repr(cell)
+        assert hours[i, 0] == pytest.approx(
+            reference_calculate_work_hours(expected_in, expected_out)), repr(cell)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_matches_scalar(seed):
+    cells = random_punch_cells(seed, 600)
+    block = np.array(cells[:600], dtype=object).reshape(20, 30)
+    check_in, check_out = attendance.parse_punch_block(block)
+    hours = attendance.calculate_work_hours_batch(check_in, check_out)
+
+    for (row, day), cell in np.ndenumerate(block):
+        scalar_in, scalar_out = attendance.parse_punch_times(cell)
+        assert (check_in[row, day], check_out[row, day]) == (scalar_in, scalar_out)
+        assert hours[row, day] == attendance.calculate_work_hours(scalar_in, scalar_out)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_punch_matrix_matches_batch(seed):
+    cells = random_punch_cells(seed, 31 * 40)
+    punches = [tuple(cells[i:i + 31]) for i in range(0, 31 * 40, 31)]
+    records = [attendance.PunchRecord(f'员工{i}', '', row) for i, row in enumerate(punches)]
+    punch_matrix = attendance.PunchMatrix.from_records(records)
+    assert punch_matrix.check_in.dtype == np.int16
+
+    check_in, check_out = attendance.parse_punch_block(np.array(punches, dtype=object))
+    assert np.array_equal(punch_matrix.punch_texts(0), check_in)
+    assert np.array_equal(punch_matrix.punch_texts(1), check_out)
+    np.testing.assert_allclose(punch_matrix.work_hours(),
+                               attendance.calculate_work_hours_batch(check_in, check_out), atol=1e-9)
+
+    # 取出部分行、部分天后结果不变
+    rows = [3, 0, 3]
+    part = punch_matrix.take(rows, 28)
+    assert np.array_equal(part.punch_texts(0), check_in[rows, :28])
+    assert np.array_equal(part.punch_texts(1), check_out[rows, :28])
@@ -0,0 +1,86 @@
+"""月度结果库和年度汇总测试"""
+
+import multiprocessing
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+import create_new_attendance_sheet as attendance
+from helpers import SOURCE_FILES, read_sheet
+
+
+@pytest.mark.skipif(not SOURCE_FILES, reason='缺少示例数据源文件')
+def test_ytd_report_matches_monthly_results(tmp_path):
+    store_file = str(tmp_path / attendance.RESULT_STORE_NAME)
+    # 同一员工各月份的考勤组可能不同，按 姓名+同名序号 识别
+    expected = {}
+    for source_file in SOURCE_FILES:
+        year, month = attendance.parse_date_from_filename(os.path.basename(source_file))
+        employees, positions, departments, punch_matrix = attendance.read_source_data_cached(
+            source_file, use_cache=False)
+        roster, punch_positions = attendance.build_roster(employees, positions, punch_matrix)
+        employee_matrix = punch_matrix.take(punch_positions, 31)
+        days = attendance.get_days_in_month(year, month)
+        attendance.save_monthly_results(store_file, year, month, roster, departments, employee_matrix, days)
+        # 没有打卡记录的员工也记入结果库，累计时长为 0
+        worked_hours = np.where(employee_matrix.worked(), employee_matrix.work_hours(), 0)[:, :days]
+        hours = iter(worked_hours.sum(axis=1))
+        seen = {}
+        for employee_key, _, has_punch in roster:
+            employee = employee_key[0]
+            occurrence = seen.get(employee, 0)
+            seen[employee] = occurrence + 1
+            expected.setdefault((employee, occurrence), {})[month] = next(hours) if has_punch else 0
+
+    output_file = str(tmp_path / 'ytd.xlsx')
+    assert attendance.create_ytd_report(year, store_file, output_file) == output_file
+    (values, _), = read_sheet(output_file)
+    headers = values[2]
+    rows = values[3:]
+    assert len(rows) == len(expected)
+    assert len({row[0] for row in rows}) == len({employee for employee, _ in expected})
+    seen = {}
+    for row in rows:
+        occurrence = seen.get(row[0], 0)
+        seen[row[0]] = occurrence + 1
+        monthly = expected[(row[0], occurrence)]
+        for month in (int(header[:-1]) for header in headers[3:-3]):
+            hours = row[headers.index(f'{month}月')]
+            assert (hours is None) == (month not in monthly)
+            if month in monthly:
+                assert float(hours) == pytest.approx(monthly[month], abs=0.01)
+        assert float(row[headers.index('累计时长')]) == pytest.approx(sum(monthly.values()), abs=0.01)
+    if len(SOURCE_FILES) > 1:
+        assert any(len(monthly) > 1 for monthly in expected.values())
+
+
+def save_month(store_file, month, barrier):
+    """子进程任务：所有进程同时开始写入同一个结果库"""
+    records = [attendance.PunchRecord(name, '客服部', ('09:00\n18:00',) * 31) for name in ('张三', '李四')]
+    punch_matrix = attendance.PunchMatrix.from_records(records)
+    roster, punch_positions = attendance.build_roster(['张三', '李四'], ['客服部', '客服部'], punch_matrix)
+    days = attendance.get_days_in_month(2025, month)
+    barrier.wait()
+    attendance.save_monthly_results(store_file, 2025, month, roster, ['客服部'] * 2,
+                                    punch_matrix.take(punch_positions, days), days)
+
+
+def test_concurrent_saves_keep_every_month(tmp_path):
+    # 批量模式下多个进程同时写入新的结果库，版本检查和建表不能清除其他进程已写入的月份
+    context = multiprocessing.get_context('fork')
+    months = range(1, 7)
+    for attempt in range(5):
+        store_file = str(tmp_path / f'{attempt}.sqlite')
+        barrier = context.Barrier(len(months))
+        processes = [context.Process(target=save_month, args=(store_file, month, barrier)) for month in months]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert [process.exitcode for process in processes] == [0] * len(months)
+        with sqlite3.connect(store_file) as conn:
+            saved = conn.execute('SELECT month, COUNT(*) FROM monthly_results GROUP BY month').fetchall()
+        conn.close()
+        assert saved == [(month, 2) for month in months]
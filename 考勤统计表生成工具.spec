@@ -1,5 +1,38 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# 用法：
+#   pyinstaller --clean --noconfirm 考勤统计表生成工具.spec
+# 环境变量：
+#   ATTENDANCE_ONEDIR=1      生成 onedir 目录版（启动时无需解压，冷启动更快）
+#   ATTENDANCE_EXE_NAME=xxx  可执行文件名（默认：考勤统计表生成工具）
 
+import os
+
+exe_name = os.environ.get('ATTENDANCE_EXE_NAME', '考勤统计表生成工具')
+onedir = os.environ.get('ATTENDANCE_ONEDIR') == '1'
+
+# 程序用不到的模块：测试、绘图、界面、交互环境、数据库和其他Excel引擎
+excludes = [
+    'pandas.tests',
+    'pandas.io.formats.style',
+    'numpy.f2py',
+    'numpy.distutils',
+    'jinja2',
+    'matplotlib',
+    'tkinter',
+    'IPython',
+    'scipy',
+    'pytest',
+    'sqlalchemy',
+    'tables',
+    'xlrd',
+    'pyxlsb',
+    'odf',
+    'xlsxwriter',
+    'bs4',
+    'html5lib',
+    'PIL',
+]
 
 a = Analysis(
     ['create_new_attendance_sheet.py'],
@@ -10,29 +43,57 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=excludes,
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='考勤统计表生成工具',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=True,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if onedir:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name=exe_name,
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        name=exe_name,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name=exe_name,
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )